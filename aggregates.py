@@ -0,0 +1,44 @@
+# Sector/industry summaries that the bar charts are drawn from.
+#
+# One groupby over the companies table, pre-sorted by the metric, yields every
+# (Sector, Industry) group's total, range, median, size and top constituents. Charts
+# then plot at most two bars per industry instead of one per company, and the
+# company-level view of a single sector is only built when it is asked for.
+
+import pandas as pd
+
+
+def group_summary(companies: pd.DataFrame, value: str, by=('Sector', 'Industry'), top_n: int=5) -> pd.DataFrame:
+    by = list(by)
+    ranked = companies.sort_values(value, ascending=False)
+    summary = ranked.groupby(by, observed=True, sort=False).agg(
+        Total=(value, 'sum'),
+        Min=(value, 'min'),
+        Max=(value, 'max'),
+        Median=(value, 'median'),
+        Count=(value, 'size'),
+        Top=('Symbol', lambda symbols: ', '.join(symbols.iloc[:top_n])),
+    )
+    return summary.reset_index()
+
+
+def envelope(summary: pd.DataFrame, value: str) -> pd.DataFrame:
+    """Largest positive and most negative member of each group, one row per bar.
+
+    Rows are ordered from the longest bar to the shortest, so overlaid bars stay visible.
+    """
+    highs = summary[summary.Max > 0].assign(**{value: lambda df: df.Max})
+    lows = summary[summary.Min < 0].assign(**{value: lambda df: df.Min})
+    bars = pd.concat([highs, lows], ignore_index=True)
+    return bars.iloc[bars[value].abs().argsort()[::-1]]
+
+
+def sector_order(summary: pd.DataFrame, column: str='Max', how: str='max') -> list:
+    return (summary.groupby('Sector', observed=True)[column].agg(how)
+            .sort_values(ascending=False).index.tolist())
+
+
+def top_constituents(companies: pd.DataFrame, value: str, sector: str=None, top_n: int=20) -> pd.DataFrame:
+    if sector is not None:
+        companies = companies[companies.Sector == sector]
+    return companies.nlargest(top_n, value)
@@ -0,0 +1,119 @@
+# Streamlit-side cache around the factories in source.py.
+#
+# Streamlit reruns a page script on every interaction and for every new session. The
+# wrappers below put the loaders and derived tables in st.cache_data (each caller gets
+# its own copy, so a session cannot mutate another session's frame) and the figures in
+# st.cache_resource (one shared object per process). Every entry is keyed on the
+# version of the CSV it is derived from, so a refreshed file is picked up on the next
+# rerun without restarting the server; clear() drops everything explicitly. Plotly
+# figures are cached already serialized, and drawn with figcache.plotly_chart();
+# Matplotlib figures come from the on-disk image cache and are drawn with imgcache.show().
+# Anything precompute.py has already built for the current data version is read from
+# the shared cache directory instead of being computed in the request.
+
+from functools import wraps
+
+import streamlit as st
+
+import source
+from artifacts import ArtifactStore
+from datafiles import COMPANIES_CSV, INDEX_CSV, file_version
+from figcache import serialize
+from imgcache import ImageCache
+from profiling import trace
+from tableview import TableView
+
+
+artifacts = ArtifactStore()
+
+
+def _shared(cache, func, *paths):
+    @wraps(func)
+    def versioned(version, *args):
+        value = artifacts.get(func.__name__, version, args)
+        return value if value is not None else func(*args)
+
+    cached = cache(show_spinner=False, max_entries=8)(versioned)
+
+    @wraps(func)
+    def wrapper(*args):
+        with trace(f'cache {func.__name__}'):
+            return cached(tuple(file_version(path) for path in paths), *args)
+
+    wrapper.clear = cached.clear
+    return wrapper
+
+
+def _serialized(func):
+    @wraps(func)
+    def wrapper(*args):
+        return serialize(func(*args))
+
+    return wrapper
+
+
+images = ImageCache()
+
+
+def _image(func, *paths):
+    @wraps(func)
+    def wrapper(*args):
+        key = images.key(func.__name__, [file_version(path) for path in paths], args)
+        data = images.get(key)
+        if data is None:
+            with st.spinner('Rendering chart...'), trace(f'wait {func.__name__}'):
+                data = images.submit(key, func, *args).result()
+        return data
+
+    return wrapper
+
+
+companies = _shared(st.cache_data, source.companies, COMPANIES_CSV)
+company_text = _shared(st.cache_data, source.company_text, COMPANIES_CSV)
+prepared_companies = _shared(st.cache_data, source.prepared_companies, COMPANIES_CSV)
+index = _shared(st.cache_data, source.index, INDEX_CSV)
+correlation_matrix = _shared(st.cache_data, source.correlation_matrix, COMPANIES_CSV)
+mega_cap_df = _shared(st.cache_data, source.mega_cap_df, COMPANIES_CSV)
+large_cap_df = _shared(st.cache_data, source.large_cap_df, COMPANIES_CSV)
+sector_summary = _shared(st.cache_data, source.sector_summary, COMPANIES_CSV)
+screener = _shared(st.cache_resource, source.screener, COMPANIES_CSV)
+
+fig_index = _shared(st.cache_resource, _serialized(source.fig_index), INDEX_CSV)
+fig_mcap_sector = _shared(st.cache_resource, _serialized(source.fig_mcap_sector), COMPANIES_CSV)
+fig_mcap_outliers = _shared(st.cache_resource, _serialized(source.fig_mcap_outliers), COMPANIES_CSV)
+fig_Ebitda = _shared(st.cache_resource, _serialized(source.fig_Ebitda), COMPANIES_CSV)
+fig_Revenue = _shared(st.cache_resource, _serialized(source.fig_Revenue), COMPANIES_CSV)
+fig_sector_drilldown = _shared(st.cache_resource, _serialized(source.fig_sector_drilldown), COMPANIES_CSV)
+fig_revenue_ebitda_cap = _shared(st.cache_resource, _serialized(source.fig_revenue_ebitda_cap), COMPANIES_CSV)
+fig_mega_large_cap = _shared(st.cache_resource, _serialized(source.fig_mega_large_cap), COMPANIES_CSV)
+cor_fig = _image(source.cor_fig, COMPANIES_CSV)
+fig_hist_mega_cap = _image(source.fig_hist_mega_cap, COMPANIES_CSV)
+fig_hist_large_cap = _image(source.fig_hist_large_cap, COMPANIES_CSV)
+
+
+# Paged views for the Introduction page, built over the cached tables above, so a
+# warmed artifact store is all they need. A company's long text is looked up when its
+# row is selected.
+def _company_details(symbol: str):
+    return company_text().loc[symbol]
+
+
+def company_view() -> TableView:
+    return TableView(companies(), key='Symbol', details=_company_details)
+
+
+def index_view() -> TableView:
+    return TableView(index())
+
+
+company_view = _shared(st.cache_resource, company_view, COMPANIES_CSV)
+index_view = _shared(st.cache_resource, index_view, INDEX_CSV)
+
+
+def clear() -> None:
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    for name in dir(source):
+        cache_clear = getattr(getattr(source, name), 'cache_clear', None)
+        if cache_clear is not None:
+            cache_clear()
@@ -0,0 +1,49 @@
+# Derived tables and serialized figures shared between processes through the cache directory.
+#
+# An artifact is the pickled result of a factory in source.py for one argument tuple
+# and one version of the files it is derived from; the file name is the factory name
+# plus a hash of both, so a new data version simply misses. precompute.py writes
+# them, app_cache reads them before computing anything itself.
+
+import hashlib
+import json
+import pickle
+
+from datafiles import CACHE_DIR
+from profiling import trace
+
+ARTIFACT_DIR = CACHE_DIR / 'artifacts'
+
+
+class ArtifactStore:
+
+    def __init__(self, root=ARTIFACT_DIR) -> None:
+        self.root = root
+
+    def path(self, name: str, versions=(), args=()):
+        identity = json.dumps([name, list(versions), list(args)], default=str)
+        return self.root / f'{name}-{hashlib.sha256(identity.encode()).hexdigest()[:24]}.pkl'
+
+    def get(self, name: str, versions=(), args=()):
+        path = self.path(name, versions, args)
+        try:
+            with open(path, 'rb') as f, trace(f'artifact {name}'):
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, name: str, versions, args, value):
+        path = self.path(name, versions, args)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+        return path
+
+    def prune(self, keep) -> int:
+        keep = set(keep)
+        stale = [path for path in self.root.glob('*.pkl') if path not in keep]
+        for path in stale:
+            path.unlink()
+        return len(stale)
@@ -0,0 +1,194 @@
+# Moving-average crossover backtests over a grid of parameters and many tickers at once.
+#
+# A rule (kind, fast, slow) is long while the fast average of the close is above the
+# slow one, and flat otherwise (or short, with long_short=True). The position is taken
+# at the close the averages are computed on, so it earns the next bar's return; every
+# change of position pays `cost` per unit traded. The averages come from the indicator
+# engine, so they are the same SMAs and EMAs that stocks.py draws, and no rule trades
+# before both of its averages exist.
+#
+# For each kind, every window in the grid is computed once over the whole
+# (dates x tickers) matrix. Then, one fast window at a time, all its slow windows, days
+# and tickers are evaluated as one float32 array: positions, PnL, compounded return,
+# Sharpe ratio, drawdown, trades and time in the market. Tickers are split into shards
+# that run in a process pool; each shard holds only its own columns. The result has one
+# row per rule and ticker; summary() ranks the rules across tickers.
+# `python backtest.py --synthetic` runs a sweep on synthetic prices.
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+STATS = ['total_return', 'sharpe', 'max_drawdown', 'trades', 'exposure']
+PERIODS_PER_YEAR = 252
+
+
+def parse_range(text: str) -> list:
+    """'5:50:5' -> [5, 10, ..., 50]; '10,20,50' -> [10, 20, 50]."""
+    if ':' in text:
+        start, stop, step = (int(part) for part in text.split(':'))
+        return list(range(start, stop + 1, step))
+    return [int(part) for part in text.split(',')]
+
+
+def _evaluate(values: np.ndarray, kinds, fast, slow, cost: float, long_short: bool, dtype) -> np.ndarray:
+    """Stats shaped (stats, kinds, fast, slow, tickers) for one shard of tickers."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = values[1:] / values[:-1] - 1
+    listed = ~np.isnan(raw)
+    returns = np.where(listed, raw, 0.0).astype(dtype)
+    days = np.maximum(listed.sum(axis=0), 2)
+    windows = sorted(set(fast) | set(slow))
+    out = np.full((len(STATS), len(kinds), len(fast), len(slow), values.shape[1]), np.nan, dtype=np.float32)
+
+    returns = returns[:, np.newaxis, :]
+    for a, kind in enumerate(kinds):
+        _, averages = indicators.compute_array(values, [(kind, window) for window in windows], dtype=dtype)
+        row = {window: i for i, window in enumerate(windows)}
+        # Day-major (days, rules, tickers), so every pass below runs along contiguous rows.
+        # Positions are decided at every close but the last, which has no next bar to earn.
+        slow_averages = np.ascontiguousarray(averages[[row[window] for window in slow], :-1].transpose(1, 0, 2))
+        for b, window in enumerate(fast):
+            columns = [c for c, other in enumerate(slow) if other > window]
+            if not columns:
+                continue
+            fast_average = averages[row[window], :-1, np.newaxis, :]
+            position = (fast_average > slow_averages[:, columns]).astype(dtype)
+            if long_short:
+                position -= fast_average < slow_averages[:, columns]
+            traded = np.empty_like(position)
+            traded[0] = position[0]
+            np.subtract(position[1:], position[:-1], out=traded[1:])
+            np.abs(traded, out=traded)
+            pnl = position * returns - cost * traded
+
+            log_wealth, worst = _drawdown(np.log1p(pnl))
+            mean = pnl.sum(axis=0) / days
+            variance = ((pnl * pnl).sum(axis=0) - days * mean * mean) / (days - 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sharpe = mean / np.sqrt(variance) * np.sqrt(PERIODS_PER_YEAR)
+            stats = [np.expm1(log_wealth), sharpe, np.expm1(worst), traded.sum(axis=0),
+                     np.abs(position).sum(axis=0) / days]
+            for s, value in enumerate(stats):
+                out[s, a, b, columns] = value
+    return out
+
+
+def _drawdown(log_returns: np.ndarray) -> tuple:
+    """Final log wealth and the deepest log drawdown, one day at a time across every column.
+
+    A loop over days with whole-row updates, which is cheaper than materializing the
+    cumulative and running-maximum arrays.
+    """
+    log_wealth = np.zeros(log_returns.shape[1:], dtype=log_returns.dtype)
+    peak = np.zeros_like(log_wealth)
+    worst = np.zeros_like(log_wealth)
+    fall = np.empty_like(log_wealth)
+    for day in log_returns:
+        log_wealth += day
+        np.maximum(peak, log_wealth, out=peak)
+        np.subtract(log_wealth, peak, out=fall)
+        np.minimum(worst, fall, out=worst)
+    return log_wealth, worst
+
+
+def _shard(args) -> np.ndarray:
+    return _evaluate(*args)
+
+
+def sweep(
+    prices: pd.DataFrame,
+    fast=(5, 10, 20),
+    slow=(20, 50, 100, 200),
+    kinds=('SMA', 'EMA'),
+    cost: float=0.0005,
+    long_short: bool=False,
+    max_workers: int=None,
+    shard_size: int=50,
+    dtype=np.float32,
+) -> pd.DataFrame:
+    """One row per (kind, fast, slow, ticker) with fast < slow, the stats as columns."""
+    kinds = [indicators.parse_spec((kind, 1))[0] for kind in kinds]
+    fast, slow = sorted(set(fast)), sorted(set(slow))
+    prices = prices.sort_index()
+    values = prices.to_numpy(dtype=np.float64)
+    shards = [values[:, start:start + shard_size] for start in range(0, values.shape[1], shard_size)]
+    args = [(shard, kinds, fast, slow, cost, long_short, dtype) for shard in shards]
+    if max_workers == 1 or len(shards) == 1:
+        results = [_shard(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers) as pool:
+            results = list(pool.map(_shard, args))
+    out = np.concatenate(results, axis=-1) if results else np.empty((len(STATS), len(kinds), len(fast), len(slow), 0))
+
+    index = pd.MultiIndex.from_product([kinds, fast, slow, prices.columns], names=['Kind', 'Fast', 'Slow', 'Ticker'])
+    frame = pd.DataFrame(out.reshape(len(STATS), -1).T, index=index, columns=STATS)
+    keep = np.broadcast_to((np.array(fast)[:, None] < np.array(slow))[None, :, :, None], out.shape[1:]).reshape(-1)
+    return frame[keep]
+
+
+def buy_and_hold(prices: pd.DataFrame) -> pd.Series:
+    """Compounded return of holding each ticker from its first price to its last."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_returns = np.log(prices.sort_index().to_numpy(dtype=np.float64))
+    return pd.Series(np.expm1(np.nansum(np.diff(log_returns, axis=0), axis=0)), index=prices.columns)
+
+
+def summary(results: pd.DataFrame, benchmark: pd.Series=None) -> pd.DataFrame:
+    """Rules ranked by median Sharpe ratio across tickers."""
+    grouped = results.groupby(level=['Kind', 'Fast', 'Slow'], sort=False)
+    table = pd.DataFrame({
+        'median_sharpe': grouped.sharpe.median(),
+        'mean_sharpe': grouped.sharpe.mean(),
+        'median_return': grouped.total_return.median(),
+        'median_drawdown': grouped.max_drawdown.median(),
+        'mean_trades': grouped.trades.mean(),
+        'mean_exposure': grouped.exposure.mean(),
+    })
+    if benchmark is not None:
+        hold = benchmark.reindex(results.index.get_level_values('Ticker')).to_numpy()
+        beat = pd.Series(results.total_return.to_numpy() > hold, index=results.index)
+        table['beats_hold'] = beat.groupby(level=['Kind', 'Fast', 'Slow'], sort=False).mean()
+    return table.sort_values('median_sharpe', ascending=False)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Sweep moving-average crossover rules over many tickers.')
+    parser.add_argument('--fast', default='5:50:5', help="fast windows, 'start:stop:step' or a comma list")
+    parser.add_argument('--slow', default='20:250:10', help='slow windows, same format')
+    parser.add_argument('--kinds', nargs='*', default=['SMA', 'EMA'])
+    parser.add_argument('--cost', type=float, default=0.0005, help='cost per unit traded, as a return')
+    parser.add_argument('--long-short', action='store_true', help='go short below the slow average instead of flat')
+    parser.add_argument('--period', default='10y', help='price history to load')
+    parser.add_argument('--workers', type=int, default=None, help='size of the process pool')
+    parser.add_argument('--top', type=int, default=10, help='number of rules to list')
+    parser.add_argument('--synthetic', type=int, default=None, metavar='TICKERS',
+                        help='use this many synthetic tickers instead of fetching the S&P 500')
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from synthetic import synthetic_prices
+
+        years = int(args.period.rstrip('y')) if args.period.endswith('y') else 1
+        prices = synthetic_prices(args.synthetic, years)
+    else:
+        from universe import StockUniverse
+
+        prices = StockUniverse.from_companies(period=args.period).load().prices()
+
+    results = sweep(prices, parse_range(args.fast), parse_range(args.slow), args.kinds, args.cost,
+                    args.long_short, args.workers)
+    rules = len(results) // max(prices.shape[1], 1)
+    print(f'{rules} rules x {prices.shape[1]} tickers x {len(prices)} days')
+    with pd.option_context('display.width', 160, 'display.precision', 3):
+        print(summary(results, buy_and_hold(prices)).head(args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# Persistent OHLCV bar store used by stocks.Stock.
+#
+# Bars are kept as one Arrow file per (interval, ticker) under the cache directory. The
+# file covers one contiguous range of time: a request that starts earlier than the
+# stored range fetches only the missing head. A request that ends after the stored
+# range fetches only the tail since its last bar; so does an open-ended one when the
+# store has not been refreshed within `max_age`. Only open-ended fetches count as a
+# refresh: one with a past `end` records that end as the covered range's. Everything
+# else is a local read. The fetch function is pluggable, so the store can run against a
+# fake provider.
+
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from datafiles import CACHE_DIR
+from profiling import traced
+
+PERIODS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+
+@traced()
+def yahoo_history(ticker: str, interval: str, start=None, end=None, period: str=None) -> pd.DataFrame:
+    import yfinance as yf
+
+    history = yf.Ticker(ticker).history(period=period, interval=interval, start=start, end=end)
+    return history.drop(['Dividends', 'Stock Splits'], axis=1, errors='ignore')
+
+
+def _timestamp(value, tz):
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        return value.tz_localize(tz or 'UTC')
+    return value.tz_convert(tz) if tz is not None else value
+
+
+def window_start(period: str=None, start=None, tz=None):
+    """First timestamp a request asks for, or None when it reaches back to inception."""
+    if start is not None:
+        return _timestamp(start, tz)
+    now = pd.Timestamp.now(tz=tz or 'UTC')
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    if period in PERIODS:
+        return now - PERIODS[period]
+    return None
+
+
+class BarStore:
+
+    def __init__(self, root=CACHE_DIR / 'bars', max_age: str='1h') -> None:
+        self.root = root
+        self.max_age = pd.Timedelta(max_age)
+
+    def path(self, ticker: str, interval: str):
+        return self.root / interval / f'{ticker}.arrow'
+
+    def read(self, ticker: str, interval: str):
+        path = self.path(ticker, interval)
+        if not path.exists():
+            return None, {}
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {}).get(b'barstore', b'{}'))
+        bars = table.to_pandas()
+        return bars, meta
+
+    def write(self, ticker: str, interval: str, bars: pd.DataFrame, meta: dict) -> None:
+        path = self.path(ticker, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(bars)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'barstore': json.dumps(meta).encode(),
+        })
+        tmp_path = path.with_suffix('.tmp')
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        tmp_path.replace(path)
+
+    def history(
+        self,
+        ticker: str,
+        interval: str='1d',
+        period: str='1y',
+        start: str=None,
+        end: str=None,
+        fetch=yahoo_history,
+    ) -> pd.DataFrame:
+        bars, meta = self.read(ticker, interval)
+        now = pd.Timestamp.now(tz='UTC')
+
+        if bars is None or bars.empty:
+            bars = fetch(ticker, interval, start=start, end=end, period=None if start else period)
+            if bars.empty:
+                return bars
+            covered_from = window_start(period, start, bars.index.tz)
+            covered_to = _timestamp(end, bars.index.tz)
+            meta = {
+                'covered_from': None if covered_from is None else covered_from.isoformat(),
+                'covered_to': None if _open_ended(covered_to, now) else covered_to.isoformat(),
+            }
+            if meta['covered_to'] is None:
+                meta['fetched_at'] = now.isoformat()
+            self.write(ticker, interval, bars, meta)
+            return bars
+
+        tz = bars.index.tz
+        want_start = window_start(period, start, tz)
+        want_end = _timestamp(end, tz)
+        covered_from = _timestamp(meta.get('covered_from'), tz)
+        changed = False
+
+        # Missing head: fetch only the range before the first stored bar.
+        if covered_from is not None and (want_start is None or want_start < covered_from):
+            head = fetch(ticker, interval, start=want_start, end=bars.index[0],
+                         period='max' if want_start is None else None)
+            bars = _merge(head, bars)
+            meta['covered_from'] = None if want_start is None else want_start.isoformat()
+            changed = True
+
+        # Missing tail: fetch only the bars since the last stored one. A range that stops
+        # at a past end is extended whenever a request reaches beyond it; an open-ended
+        # one is refreshed once it is older than max_age.
+        covered_to = _timestamp(meta.get('covered_to'), tz)
+        if covered_to is not None:
+            needs_tail = want_end is None or want_end > covered_to
+        else:
+            fetched_at = pd.Timestamp(meta.get('fetched_at', now - 2 * self.max_age))
+            needs_tail = (want_end is None or want_end > bars.index[-1]) and now - fetched_at > self.max_age
+        if needs_tail:
+            tail_end = None if covered_to is None or _open_ended(want_end, now) else want_end
+            tail = fetch(ticker, interval, start=bars.index[-1], end=tail_end, period=None)
+            bars = _merge(bars, tail)
+            meta['covered_to'] = None if tail_end is None else tail_end.isoformat()
+            if tail_end is None:
+                meta['fetched_at'] = now.isoformat()
+            changed = True
+
+        if changed:
+            self.write(ticker, interval, bars, meta)
+
+        window = bars
+        if want_start is not None:
+            window = window[window.index >= want_start]
+        if want_end is not None:
+            window = window[window.index < want_end]
+        return window
+
+
+def _open_ended(end, now) -> bool:
+    # A request ending in the future covers everything available now.
+    return end is None or end > now
+
+
+def _merge(older: pd.DataFrame, newer: pd.DataFrame) -> pd.DataFrame:
+    if newer is None or newer.empty:
+        return older
+    if older is None or older.empty:
+        return newer
+    if newer.index.tz != older.index.tz and newer.index.tz is not None:
+        newer = newer.tz_convert(older.index.tz)
+    # The last stored bar may have been a partial one, so the newer copy wins.
+    merged = pd.concat([older, newer])
+    return merged[~merged.index.duplicated(keep='last')].sort_index()
@@ -0,0 +1,311 @@
+# Benchmarks of the analysis pipeline on synthetic data of increasing size.
+#
+# `python benchmark.py -o results.json` generates companies tables (500 to 50k rows by
+# default, resampled from the bundled table with perturbed fundamentals), an index
+# history and price panels (1 to 500 tickers over 20 years of business days), all from
+# a fixed seed with the generators in synthetic.py. Each suite runs in a fresh
+# subprocess with SP500_DATA_DIR pointing at the generated CSVs and an empty
+# SP500_CACHE_DIR, and times the real factories in source.py, stocks.py, indicators.py,
+# attribution.py, covariance.py and backtest.py: loading, imputation, correlation,
+# regression, indicator computation, return attribution, rolling risk, crossover
+# backtests, figure construction and serialization. Every stage reports the minimum and
+# median wall time and the peak of traced allocations from an extra run, plus the
+# worker's maximum RSS. Expect the 50k-row suite to take a while: the per-symbol scatter
+# charts grow linearly with the number of companies.
+#
+# Results are JSON, with the commit and package versions they were measured at.
+# `python benchmark.py --compare old.json new.json` lists the stages that got slower.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from synthetic import (SEED, TRADING_DAYS, YEARS, synthetic_companies, synthetic_fetch, synthetic_index,
+                       synthetic_prices)
+
+HERE = Path(__file__).resolve().parent
+COMPANY_SIZES = [500, 5000, 50000]
+TICKER_COUNTS = [1, 50, 500]
+
+
+# -- measurement -------------------------------------------------------------------------
+
+def measure(func, setup=None, repeat: int=3, budget: float=30.0) -> dict:
+    """Time `func` after `setup`, at most `repeat` times or until `budget` seconds are spent."""
+    times = []
+    while len(times) < repeat and sum(times) < budget:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    # Tracing allocations slows a run down several times; stages already over budget skip it.
+    peak = None
+    if sum(times) < budget:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'runs': len(times), 'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak}
+
+
+def _clear_source() -> None:
+    import source
+
+    for name in dir(source):
+        cache_clear = getattr(getattr(source, name), 'cache_clear', None)
+        if cache_clear is not None:
+            cache_clear()
+
+
+def _fresh(*warm):
+    def setup():
+        _clear_source()
+        for func in warm:
+            func()
+    return setup
+
+
+def companies_stages() -> dict:
+    import source
+    from figcache import serialize
+    from imgcache import rasterize
+    from snapshot import build_snapshots
+    from tableview import TableView
+
+    def no_snapshot():
+        shutil.rmtree(Path(os.environ['SP500_CACHE_DIR']) / 'snapshots', ignore_errors=True)
+        _clear_source()
+
+    def snapshot():
+        build_snapshots()
+        _clear_source()
+
+    stages = {
+        'load_csv': (source.load_companies, no_snapshot),
+        'load_snapshot': (source.load_companies, snapshot),
+        'impute': (source.prepared_companies, _fresh(source.load_companies)),
+        'screener': (source.screener, _fresh(source.companies)),
+        'correlation': (source.correlation_matrix, _fresh(source.screener)),
+        'sector_summary': (lambda: source.sector_summary('Marketcap'), _fresh(source.companies)),
+        # The first page of a fresh view: sort order and search columns are built on the way.
+        'table_page': (lambda: TableView(source.companies()).query(sort='Marketcap', ascending=False, search='inc'),
+                       _fresh(source.companies)),
+    }
+    for name in ['fig_mcap_sector', 'fig_mcap_outliers', 'fig_Ebitda', 'fig_Revenue',
+                 'fig_revenue_ebitda_cap', 'fig_mega_large_cap']:
+        build = getattr(source, name)
+        stages[f'{name}.build'] = (build, _fresh(source.companies, source.screener))
+        stages[f'{name}.serialize'] = (lambda build=build: serialize(build()), None)
+    for name in ['cor_fig', 'fig_hist_mega_cap']:
+        build = getattr(source, name)
+        stages[f'{name}.build'] = (build, _fresh(source.companies, source.screener))
+        stages[f'{name}.rasterize'] = (lambda build=build: rasterize(build()), None)
+    return stages
+
+
+def index_stages() -> dict:
+    import source
+    from figcache import serialize
+
+    def cold_store():
+        shutil.rmtree(source.index_store.root, ignore_errors=True)
+        source.index_store.state = {}
+        _clear_source()
+
+    return {
+        'load_index': (source.load_index, cold_store),
+        'index_regression': (source.index_regression, _fresh(source.load_index)),
+        'fig_index.build': (source.fig_index, _fresh(source.load_index)),
+        'fig_index.serialize': (lambda: serialize(source.fig_index()), None),
+    }
+
+
+def prices_stages(n_tickers: int, years: int) -> dict:
+    import attribution
+    import backtest
+    import covariance
+    import indicators
+    import returnstats
+    import stocks
+
+    prices = synthetic_prices(n_tickers, years)
+    returns = prices.pct_change(fill_method=None)
+    fetch = synthetic_fetch(years)
+    weights = pd.Series(np.random.default_rng(SEED).pareto(1.2, n_tickers) + 0.01, index=prices.columns)
+    sectors = pd.Series(np.arange(n_tickers) % 11, index=prices.columns)
+    return {
+        'indicators': (lambda: indicators.compute(prices, stocks.INDICATORS), None),
+        'returnstats': (lambda: returnstats.summary(returns), None),
+        'stock_indicators': (lambda: indicators.for_series(
+            stocks.Stock('T0000', period='max', fetch=fetch, store=None).df['Close'], stocks.INDICATORS), None),
+        'attribution': (lambda: attribution.attribute(prices, weights).by_group(sectors).total(), None),
+        'rolling_risk_1y': (lambda: covariance.rolling_risk(returns.iloc[-TRADING_DAYS:], sectors), None),
+        'backtest_sweep': (lambda: backtest.sweep(prices, max_workers=1), None),
+    }
+
+
+def run_worker(spec: dict) -> dict:
+    suite = spec['suite']
+    if suite == 'companies':
+        stages = companies_stages()
+    elif suite == 'index':
+        stages = index_stages()
+    else:
+        stages = prices_stages(spec['tickers'], spec['years'])
+    results = []
+    for stage, (func, setup) in stages.items():
+        results.append({**spec, 'stage': stage, **measure(func, setup, spec['repeat'], spec['budget'])})
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return {'results': results, 'max_rss_bytes': max_rss}
+
+
+# -- driver ------------------------------------------------------------------------------
+
+def _import_time(module: str, repeat: int) -> dict:
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    times = [float(subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True,
+                                  capture_output=True, text=True).stdout) for _ in range(repeat)]
+    return {'suite': 'import', 'stage': f'import {module}', 'runs': repeat,
+            'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': None}
+
+
+def _run_suite(spec: dict, data_dir: Path, log) -> list:
+    env = {**os.environ, 'SP500_DATA_DIR': str(data_dir), 'SP500_CACHE_DIR': str(data_dir / '.cache'),
+           'MPLBACKEND': 'Agg'}
+    shutil.rmtree(data_dir / '.cache', ignore_errors=True)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, __file__, '--worker', json.dumps(spec)], cwd=HERE, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        log(f'{spec} failed:\n{proc.stderr}')
+        return []
+    output = json.loads(proc.stdout.splitlines()[-1])
+    log(f'{json.dumps(spec)}: {time.perf_counter() - started:.1f}s, max RSS {output["max_rss_bytes"] / 2**20:.0f} MiB')
+    for result in output['results']:
+        result['max_rss_bytes'] = output['max_rss_bytes']
+    return output['results']
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(['git', *args], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(company_sizes=COMPANY_SIZES, ticker_counts=TICKER_COUNTS, years: int=YEARS, repeat: int=3,
+        budget: float=30.0, log=print) -> dict:
+    import importlib.metadata
+
+    results = [_import_time(module, repeat) for module in ('source', 'stocks')]
+    with tempfile.TemporaryDirectory(prefix='sp500-bench-') as tmp:
+        for size in company_sizes:
+            data_dir = Path(tmp) / f'companies-{size}'
+            data_dir.mkdir()
+            synthetic_companies(size).to_csv(data_dir / 'sp500_companies.csv', index=False)
+            synthetic_index(years).to_csv(data_dir / 'sp500_index.csv', index=False)
+            spec = {'suite': 'companies', 'companies': size, 'repeat': repeat, 'budget': budget}
+            results += _run_suite(spec, data_dir, log)
+            if size == company_sizes[0]:
+                spec = {'suite': 'index', 'years': years, 'repeat': repeat, 'budget': budget}
+                results += _run_suite(spec, data_dir, log)
+        for n_tickers in ticker_counts:
+            spec = {'suite': 'prices', 'tickers': n_tickers, 'years': years, 'repeat': repeat, 'budget': budget}
+            data_dir = Path(tmp) / f'prices-{n_tickers}'
+            data_dir.mkdir()
+            results += _run_suite(spec, data_dir, log)
+
+    packages = {}
+    for package in ('numpy', 'pandas', 'plotly', 'matplotlib', 'scipy', 'pyarrow', 'streamlit'):
+        try:
+            packages[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            packages[package] = None
+    return {
+        'meta': {
+            'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'packages': packages,
+            'seed': SEED,
+            'repeat': repeat,
+            'budget': budget,
+        },
+        'results': results,
+    }
+
+
+def _case(result: dict) -> tuple:
+    params = tuple((key, result.get(key)) for key in ('suite', 'companies', 'tickers', 'years'))
+    return params + (('stage', result['stage']),)
+
+
+def compare(old: dict, new: dict, threshold: float=1.2) -> pd.DataFrame:
+    """Median times of the stages in both runs, slowest regressions first."""
+    old_times = {_case(result): result['median_s'] for result in old['results']}
+    rows = []
+    for result in new['results']:
+        before = old_times.get(_case(result))
+        if before:
+            rows.append({**dict(_case(result)), 'old_s': before, 'new_s': result['median_s'],
+                         'ratio': result['median_s'] / before})
+    report = pd.DataFrame(rows).sort_values('ratio', ascending=False)
+    report['regression'] = report.ratio > threshold
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic data.')
+    parser.add_argument('-o', '--output', help='write the JSON results to this file')
+    parser.add_argument('--companies', type=int, nargs='*', default=COMPANY_SIZES, help='companies table sizes')
+    parser.add_argument('--tickers', type=int, nargs='*', default=TICKER_COUNTS, help='price panel widths')
+    parser.add_argument('--years', type=int, default=YEARS, help='years of daily history')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--budget', type=float, default=30.0, help='seconds after which a stage stops repeating')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+    if args.compare:
+        old, new = (json.loads(Path(path).read_text()) for path in args.compare)
+        report = compare(old, new, args.threshold)
+        with pd.option_context('display.width', 160, 'display.max_rows', None):
+            print(report.to_string(index=False))
+        return 1 if report.regression.any() else 0
+
+    results = run(args.companies, args.tickers, args.years, args.repeat, args.budget, log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(results, indent=1)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
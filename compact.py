@@ -0,0 +1,66 @@
+# Compact in-process representation of the companies table.
+#
+# The table is held once per worker process, so its size bounds how many workers fit on
+# a host. compact() turns repetitive text columns into categoricals, downcasts numeric
+# columns where that loses nothing, and leaves out the long free-text columns; those are
+# read separately, and only when a page asks for them. memory_report() shows where the
+# bytes go, per column. `python compact.py` prints it for the bundled CSV.
+
+import numpy as np
+import pandas as pd
+
+TEXT_COLUMNS = ['Longname', 'Longbusinesssummary']
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _downcast(values: pd.Series) -> pd.Series:
+    # Only lossless casts: integral values to the smallest integer type that holds them,
+    # floats to float32 when every value round-trips exactly.
+    if values.isna().any() or values.dtype.kind not in 'iuf':
+        return values
+    if values.dtype.kind == 'f' and (values % 1 == 0).all():
+        downcast = pd.to_numeric(values.astype(np.int64), downcast='integer')
+    elif values.dtype.kind in 'iu':
+        downcast = pd.to_numeric(values, downcast='integer')
+    else:
+        downcast = values.astype(np.float32)
+    smaller = downcast.dtype.itemsize < values.dtype.itemsize
+    return downcast if smaller and (downcast.astype(values.dtype) == values).all() else values
+
+
+def compact(companies: pd.DataFrame, text_columns=TEXT_COLUMNS, max_category_ratio: float=MAX_CATEGORY_RATIO) -> pd.DataFrame:
+    companies = companies.drop(columns=[column for column in text_columns if column in companies])
+    columns = {}
+    for column, values in companies.items():
+        if values.dtype == object and values.nunique() <= max_category_ratio * len(values):
+            values = values.astype('category')
+        elif values.dtype.kind in 'iuf':
+            values = _downcast(values)
+        columns[column] = values
+    return pd.DataFrame(columns, index=companies.index)
+
+
+def memory_report(frame: pd.DataFrame, baseline: pd.DataFrame=None) -> pd.DataFrame:
+    """Bytes per column, including the Python objects behind object columns."""
+    report = pd.DataFrame({
+        'dtype': frame.dtypes.astype(str),
+        'bytes': frame.memory_usage(deep=True, index=False),
+    })
+    if baseline is not None:
+        report = report.join(pd.DataFrame({
+            'baseline_dtype': baseline.dtypes.astype(str),
+            'baseline_bytes': baseline.memory_usage(deep=True, index=False),
+        }), how='outer')
+        report['saved'] = report.baseline_bytes - report.bytes.fillna(0)
+    report.loc['Total'] = report.select_dtypes('number').sum()
+    return report
+
+
+if __name__ == '__main__':
+    import source
+    from datafiles import COMPANIES_CSV
+
+    raw = pd.read_csv(COMPANIES_CSV)
+    raw['Mc/EBITDA'] = raw.Marketcap/raw.Ebitda
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        print(memory_report(source.companies(), raw))
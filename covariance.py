@@ -0,0 +1,286 @@
+# Rolling covariance of constituent returns, and the concentration measures built on it.
+#
+# Recomputing an (N x N) covariance for every window position costs O(T N^2 W). Here it
+# is carried forward one day at a time instead. RollingCovariance keeps the window's
+# sums and cross products and changes them by one rank-2 update per day: the new day in,
+# the day leaving the window out. The sums are recomputed from its ring buffer each time
+# it wraps, so rounding cannot accumulate. The (N x N) cross products are only kept once
+# covariance() is first asked for; the (W x W) route below needs the sums alone.
+# EwmaCovariance applies the exponentially weighted recursion with decay λ, as
+# RiskMetrics does. A name missing a return in the window has no covariance for it;
+# under EWMA a missing return counts as the name's mean.
+#
+# rolling_risk() runs over a (dates x tickers) return matrix and records, per day: the
+# largest eigenvalue of the correlation matrix and the absorption ratio (the share of
+# total variance along its top k eigenvectors), and the average correlation within and
+# between sectors. A window of W < N days has rank at most W, so both come from the
+# standardized (W x N) window: the eigenvalues from its (W x W) Gram matrix, the sector
+# sums from its (W x sectors) totals, without forming the (N x N) correlation matrix at
+# all. Results are float32. Each day's full correlation matrix can be kept as well, as
+# its packed upper triangle, in memory or in a memory-mapped .npy file for long
+# histories.
+#
+# A W-day window has at most W nonzero eigenvalues, so k defaults to a fifth of N or of
+# W, whichever is smaller; with k >= W the absorption ratio is 1 whatever the data.
+
+import argparse
+import sys
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class RollingCovariance:
+
+    def __init__(self, n: int, window: int=63) -> None:
+        if window < 2:
+            raise ValueError('window must be at least 2')
+        self.window = window
+        self.buffer = np.zeros((window, n))
+        self.missing = np.ones((window, n), dtype=bool)
+        # Days appended; the oldest day in the window sits at count % window.
+        self.count = 0
+        self.sums = np.zeros(n)
+        # Built from the buffer on the first covariance() call, then updated with it.
+        self.products = None
+        self.gaps = np.full(n, window, dtype=np.int64)
+
+    def update(self, returns) -> None:
+        x = np.asarray(returns, dtype=np.float64)
+        missing = np.isnan(x)
+        x = np.where(missing, 0.0, x)
+        slot = self.count % self.window
+        leaving = self.buffer[slot]
+        if self.products is not None:
+            # x x' - y y' as a single (n x 2) @ (2 x n) product.
+            self.products += np.stack([x, leaving], axis=1) @ np.stack([x, -leaving])
+        self.sums += x - leaving
+        self.gaps += missing.astype(np.int64) - self.missing[slot]
+        self.buffer[slot] = x
+        self.missing[slot] = missing
+        self.count += 1
+        if slot == self.window - 1:
+            if self.products is not None:
+                self.products = self.buffer.T @ self.buffer
+            self.sums = self.buffer.sum(axis=0)
+
+    def valid(self) -> np.ndarray:
+        return self.gaps == 0
+
+    def covariance(self) -> np.ndarray:
+        if self.products is None:
+            self.products = self.buffer.T @ self.buffer
+        cov = (self.products - np.outer(self.sums, self.sums) / self.window) / (self.window - 1)
+        invalid = ~self.valid()
+        cov[invalid, :] = np.nan
+        cov[:, invalid] = np.nan
+        return cov
+
+    def factor(self) -> np.ndarray:
+        """F with F'F the correlation matrix of the valid names, zero columns for the rest."""
+        valid = self.valid()
+        centred = self.buffer - self.sums / self.window
+        scale = np.sqrt((centred ** 2).sum(axis=0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(valid & (scale > 0), centred / scale, 0.0)
+
+
+class EwmaCovariance:
+
+    def __init__(self, n: int, decay: float=0.94, min_periods: int=None) -> None:
+        if not 0 < decay < 1:
+            raise ValueError('decay must be between 0 and 1')
+        self.decay = decay
+        # By default a name counts once it has as many returns as the average's effective length.
+        self.min_periods = min_periods if min_periods is not None else int(round(1 / (1 - decay)))
+        self.seen = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.cov = np.zeros((n, n))
+
+    def update(self, returns) -> None:
+        x = np.asarray(returns, dtype=np.float64)
+        observed = ~np.isnan(x)
+        first = observed & (self.seen == 0)
+        self.mean[first] = x[first]
+        self.seen += observed
+        deviation = np.where(observed, x - self.mean, 0.0)
+        self.mean += (1 - self.decay) * deviation
+        self.cov *= self.decay
+        self.cov += (self.decay * (1 - self.decay)) * np.outer(deviation, deviation)
+
+    def valid(self) -> np.ndarray:
+        return self.seen >= self.min_periods
+
+    def covariance(self) -> np.ndarray:
+        cov = self.cov.copy()
+        invalid = ~self.valid()
+        cov[invalid, :] = np.nan
+        cov[:, invalid] = np.nan
+        return cov
+
+
+def correlation(cov: np.ndarray) -> np.ndarray:
+    scale = np.sqrt(np.diag(cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / np.outer(scale, scale)
+
+
+def spectrum_and_blocks(engine, members: np.ndarray) -> tuple:
+    """Eigenvalues (largest first) of the valid names' correlation matrix, and the sums of
+    its entries between every pair of sectors; `members` has a column per sector and zero
+    rows for names outside the window.
+    """
+    if isinstance(engine, RollingCovariance) and engine.window < len(members):
+        # corr = F'F: both come from (W x W) and (W x sectors) products.
+        factor = engine.factor()
+        grouped = factor @ members
+        return np.linalg.eigvalsh(factor @ factor.T)[::-1], grouped.T @ grouped
+    # Names outside the window drop out as zero rows and columns.
+    valid = members.any(axis=1)
+    corr = np.where(valid[:, np.newaxis] & valid, correlation(engine.covariance()), 0.0)
+    return np.linalg.eigvalsh(corr)[::-1], members.T @ corr @ members
+
+
+def sector_blocks(sums: np.ndarray, size: np.ndarray) -> np.ndarray:
+    """Average correlation between every pair of sectors; the diagonal leaves out self-pairs."""
+    sums = sums.copy()
+    counts = np.outer(size, size)
+    np.fill_diagonal(sums, np.diag(sums) - size)
+    np.fill_diagonal(counts, size * (size - 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+class RiskHistory(NamedTuple):
+    index: pd.Index
+    tickers: pd.Index
+    top_eigenvalue: pd.Series
+    absorption: pd.Series
+    sectors: pd.Index
+    sector_correlations: np.ndarray
+    correlations: np.ndarray
+
+    def _row(self, date) -> int:
+        return self.index.get_loc(date) if date is not None else len(self.index) - 1
+
+    def sector_correlation(self, date=None) -> pd.DataFrame:
+        return pd.DataFrame(self.sector_correlations[self._row(date)], index=self.sectors, columns=self.sectors)
+
+    def correlation(self, date=None) -> pd.DataFrame:
+        """The full correlation matrix of one day, when rolling_risk() kept them."""
+        if self.correlations is None:
+            raise ValueError('correlation matrices were not kept; pass store= to rolling_risk()')
+        n = len(self.tickers)
+        matrix = np.eye(n, dtype=self.correlations.dtype)
+        upper = np.triu_indices(n, 1)
+        matrix[upper] = self.correlations[self._row(date)]
+        matrix.T[upper] = matrix[upper]
+        # Names outside the window have no correlation with anything, themselves included.
+        invalid = np.isnan(matrix).sum(axis=0) == n - 1
+        matrix[invalid, :] = np.nan
+        matrix[:, invalid] = np.nan
+        return pd.DataFrame(matrix, index=self.tickers, columns=self.tickers)
+
+
+def rolling_risk(
+    returns: pd.DataFrame,
+    sectors: pd.Series=None,
+    window: int=63,
+    decay: float=None,
+    k: int=None,
+    store=None,
+    dtype=np.float32,
+) -> RiskHistory:
+    """Concentration measures per day; with `decay`, EWMA instead of a `window`.
+
+    `store` keeps every day's correlation matrix: 'memory' in an array, or a path for a
+    memory-mapped .npy file of shape (dates, N (N - 1) / 2).
+    """
+    values = returns.to_numpy(dtype=np.float64)
+    t, n = values.shape
+    engine = EwmaCovariance(n, decay) if decay is not None else RollingCovariance(n, window)
+    k = k or max(1, (n if decay is not None else min(n, window)) // 5)
+
+    if sectors is None:
+        sectors = pd.Series('All', index=returns.columns)
+    groups = sectors.reindex(returns.columns).astype(object)
+    codes, names = pd.factorize(groups.where(groups.notna(), 'Unknown'), sort=True)
+    membership = np.zeros((n, len(names)))
+    membership[np.arange(n), codes] = 1.0
+
+    top = np.full(t, np.nan, dtype=dtype)
+    absorption = np.full(t, np.nan, dtype=dtype)
+    blocks = np.full((t, len(names), len(names)), np.nan, dtype=dtype)
+    upper = np.triu_indices(n, 1)
+    if store is None:
+        correlations = None
+    elif store == 'memory':
+        correlations = np.full((t, len(upper[0])), np.nan, dtype=dtype)
+    else:
+        correlations = np.lib.format.open_memmap(store, mode='w+', dtype=dtype, shape=(t, len(upper[0])))
+
+    for day in range(t):
+        engine.update(values[day])
+        valid = engine.valid()
+        if valid.sum() < 2:
+            if correlations is not None:
+                correlations[day] = np.nan
+            continue
+        members = membership * valid[:, np.newaxis]
+        spectrum, sums = spectrum_and_blocks(engine, members)
+        top[day] = spectrum[0]
+        absorption[day] = spectrum[:k].sum() / valid.sum()
+        blocks[day] = sector_blocks(sums, members.sum(axis=0))
+        if correlations is not None:
+            correlations[day] = correlation(engine.covariance())[upper]
+
+    if isinstance(correlations, np.memmap):
+        correlations.flush()
+    return RiskHistory(
+        returns.index,
+        returns.columns,
+        pd.Series(top, index=returns.index, name='Top eigenvalue'),
+        pd.Series(absorption, index=returns.index, name='Absorption ratio'),
+        pd.Index(names, name=sectors.name),
+        blocks,
+        correlations,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Rolling correlation and concentration of constituent returns.')
+    parser.add_argument('--period', default='1y', help='price history to load, e.g. 1y or 10y')
+    parser.add_argument('--window', type=int, default=63, help='rolling window in days')
+    parser.add_argument('--decay', type=float, default=None, help='EWMA decay instead of a window, e.g. 0.94')
+    parser.add_argument('--store', default=None, help='write the daily correlation matrices to this .npy file')
+    parser.add_argument('--synthetic', action='store_true', help='use synthetic prices instead of fetching them')
+    args = parser.parse_args(argv)
+
+    from attribution import index_weights
+    from snapshot import read_companies
+
+    companies = read_companies(['Symbol', 'Sector', 'Weight'])
+    tickers = index_weights(companies).index
+    sectors = pd.Series(companies.Sector.to_numpy(), index=tickers, name='Sector')
+    if args.synthetic:
+        from synthetic import synthetic_prices
+
+        years = int(args.period.rstrip('y')) if args.period.endswith('y') else 1
+        prices = synthetic_prices(len(tickers), years).set_axis(tickers, axis=1)
+    else:
+        from universe import StockUniverse
+
+        prices = StockUniverse(tickers, period=args.period).load().prices()
+
+    risk = rolling_risk(prices.pct_change(fill_method=None), sectors, args.window, args.decay, store=args.store)
+    latest = risk.absorption.last_valid_index()
+    print(f'{latest:%Y-%m-%d}: absorption ratio {risk.absorption[latest]:.3f},'
+          f' top eigenvalue {risk.top_eigenvalue[latest]:.1f} of {len(risk.tickers)} names')
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 2):
+        print(risk.sector_correlation(latest))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# Locations of the bundled datasets and helpers to tell when they change.
+#
+# A data version is the file's mtime plus a digest of its content. The digest is only
+# recomputed when the mtime or size moves, so checking the version costs one stat() call.
+# SP500_DATA_DIR and SP500_CACHE_DIR point the app at other data and cache directories.
+
+import hashlib
+import os
+import threading
+from functools import wraps
+from pathlib import Path
+
+from profiling import trace
+
+DATA_DIR = Path(os.environ.get('SP500_DATA_DIR', Path(__file__).resolve().parent))
+COMPANIES_CSV = DATA_DIR / 'sp500_companies.csv'
+INDEX_CSV = DATA_DIR / 'sp500_index.csv'
+CACHE_DIR = Path(os.environ.get('SP500_CACHE_DIR', DATA_DIR / '.cache'))
+
+# path -> (mtime, size, digest); one entry per file, replaced when the file changes.
+_digests = {}
+
+
+def file_version(path) -> str:
+    stat = os.stat(path)
+    seen = _digests.get(str(path))
+    if seen is not None and seen[:2] == (stat.st_mtime_ns, stat.st_size):
+        digest = seen[2]
+    else:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()[:16]
+        _digests[str(path)] = (stat.st_mtime_ns, stat.st_size, digest)
+    return f'{stat.st_mtime_ns:x}-{digest}'
+
+
+def versioned_cache(*paths, maxsize: int=None):
+    """Memoize a factory per argument tuple until one of `paths` changes on disk."""
+    def decorator(func):
+        wrapper = keyed_cache(lambda: tuple(file_version(path) for path in paths), maxsize)(func)
+        wrapper.paths = paths
+        return wrapper
+    return decorator
+
+
+def keyed_cache(version, maxsize: int=None):
+    """Memoize a factory per argument tuple until `version()` returns something else.
+
+    With `maxsize`, the oldest argument tuples are evicted first. Sessions run on
+    separate threads: the entries are guarded by a lock, and concurrent misses on the
+    same key wait for one build instead of each running the factory.
+    """
+    def decorator(func):
+        entries = {}
+        builds = {}
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            current = version()
+            key = (current, args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    return entries[key]
+                build = builds.setdefault(key, threading.Lock())
+            # Held only while this key is built, so factories can call other keys.
+            with build:
+                with lock:
+                    if key in entries:
+                        return entries[key]
+                try:
+                    with trace(func.__name__):
+                        value = func(*args, **kwargs)
+                except BaseException:
+                    with lock:
+                        builds.pop(key, None)
+                    raise
+                # Published and released together, so no caller can find neither the
+                # entry nor the build lock and start the factory again.
+                with lock:
+                    for stale in [k for k in entries if k[0] != current]:
+                        del entries[stale]
+                    if maxsize is not None:
+                        for old in list(entries)[:max(len(entries) - maxsize + 1, 0)]:
+                            del entries[old]
+                    entries[key] = value
+                    builds.pop(key, None)
+            return value
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
@@ -0,0 +1,114 @@
+# Point-budget downsampling applied before long time series are handed to a chart.
+#
+# A series longer than the budget is reduced with Largest-Triangle-Three-Buckets (LTTB),
+# which keeps the visual shape of a line, or with min/max per bucket, which keeps every
+# spike. OHLC bars are instead merged into wider bars so each candle stays truthful.
+# Charts pass the visible date range, so zooming in re-samples at full detail for the
+# narrower window. The default budget is set with SP500_POINT_BUDGET.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from resample import ohlcv_agg
+
+POINT_BUDGET = int(os.environ.get('SP500_POINT_BUDGET', 1000))
+
+
+def _numeric(values) -> np.ndarray:
+    values = pd.Series(values) if not isinstance(values, (pd.Series, pd.Index)) else values
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').view('int64').astype(np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    x, y = _numeric(x), _numeric(y)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # First and last points are always kept; the rest is split into n_out - 2 buckets.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    y = _numeric(y)
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = n_out // 2
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    lows = offsets + np.nanargmin(padded[valid], axis=1)
+    highs = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def _clip(df: pd.DataFrame, x: str=None, x_range=None) -> pd.DataFrame:
+    if x_range is None:
+        return df
+    values = df.index if x is None else df[x]
+    tz = getattr(values.dtype, 'tz', None)
+    mask = np.ones(len(df), dtype=bool)
+    for bound, keep in zip(x_range, (np.greater_equal, np.less_equal)):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        if tz is not None and bound.tzinfo is None:
+            bound = bound.tz_localize(tz)
+        mask &= np.asarray(keep(values, bound))
+    return df[mask]
+
+
+def downsample(
+    df: pd.DataFrame,
+    y: str,
+    x: str=None,
+    max_points: int=POINT_BUDGET,
+    method: str='lttb',
+    x_range=None,
+) -> pd.DataFrame:
+    """Rows of `df` to plot for `y` against `x` (or the index), within `x_range`."""
+    df = _clip(df, x, x_range)
+    if not max_points or len(df) <= max_points:
+        return df
+    xs = df.index if x is None else df[x]
+    if method == 'lttb':
+        rows = lttb_indices(xs, df[y], max_points)
+    elif method == 'minmax':
+        rows = minmax_indices(df[y], max_points)
+    else:
+        raise ValueError(f'unknown downsampling method: {method!r}')
+    return df.iloc[rows]
+
+
+def downsample_ohlc(df: pd.DataFrame, max_points: int=POINT_BUDGET, x_range=None) -> pd.DataFrame:
+    """Merge consecutive bars so at most `max_points` candles remain."""
+    df = _clip(df, None, x_range)
+    if not max_points or len(df) <= max_points:
+        return df
+    size = -(-len(df) // max_points)
+    groups = np.arange(len(df)) // size
+    merged = df.groupby(groups).agg(ohlcv_agg(df.columns))
+    merged.index = df.index[::size]
+    return merged
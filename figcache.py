@@ -0,0 +1,127 @@
+# Plotly figures serialized once, rendered from the cached JSON.
+#
+# st.plotly_chart() converts the figure to a dict and encodes it to JSON on every call,
+# so every session and every rerun pays for the full encoding again. serialize() does
+# that work once: the payload holds the JSON spec (optionally zlib-compressed) and a
+# content hash, and plotly_chart() sends it as the same PlotlyChart element Streamlit
+# would build, using the hash instead of the spec to compute the element id.
+#
+# merge_traces() is the trace-consolidation mode: plotly express draws one trace per
+# colour value, so color='Symbol' yields one trace per company. Traces that share axes
+# and a hover template are merged into a single scattergl trace with per-point colours.
+
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+
+from profiling import trace, traced
+
+CONSOLIDATE_TRACES = os.environ.get('SP500_CONSOLIDATE_TRACES', '1') == '1'
+
+
+class FigurePayload:
+
+    def __init__(self, spec: str, compress: bool=False) -> None:
+        data = spec.encode()
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.compressed = compress
+        self._data = zlib.compress(data) if compress else spec
+        self.size = len(data)
+
+    @property
+    def spec(self) -> str:
+        return zlib.decompress(self._data).decode() if self.compressed else self._data
+
+    def __repr__(self) -> str:
+        return f'<FigurePayload {self.digest} ({self.size} bytes)>'
+
+
+@traced()
+def serialize(fig, compress: bool=False) -> FigurePayload:
+    import plotly.io
+
+    return FigurePayload(plotly.io.to_json(fig, validate=False), compress)
+
+
+def _column(values, n: int) -> np.ndarray:
+    if values is None or np.ndim(values) == 0:
+        return np.full(n, values, dtype=object)
+    return np.asarray(values)
+
+
+def merge_traces(fig):
+    import plotly.graph_objects as go
+
+    groups = {}
+    for trace in fig.data:
+        if trace.type not in ('scatter', 'scattergl'):
+            groups[id(trace)] = [trace]
+            continue
+        groups.setdefault((trace.xaxis, trace.yaxis, trace.hovertemplate, trace.mode), []).append(trace)
+
+    data = []
+    for traces in groups.values():
+        first = traces[0]
+        if len(traces) == 1 and first.type not in ('scatter', 'scattergl'):
+            data.append(first)
+            continue
+        lengths = [len(trace.x) for trace in traces]
+        marker = first.marker.to_plotly_json()
+        marker['color'] = np.concatenate([_column(trace.marker.color, n) for trace, n in zip(traces, lengths)]).tolist()
+        if np.ndim(first.marker.size) > 0:
+            marker['size'] = np.concatenate([np.asarray(trace.marker.size) for trace in traces])
+        data.append(go.Scattergl(
+            x=np.concatenate([np.asarray(trace.x) for trace in traces]),
+            y=np.concatenate([np.asarray(trace.y) for trace in traces]),
+            customdata=(np.concatenate([np.asarray(trace.customdata) for trace in traces])
+                        if first.customdata is not None else None),
+            mode=first.mode,
+            marker=marker,
+            hovertemplate=first.hovertemplate,
+            xaxis=first.xaxis,
+            yaxis=first.yaxis,
+            showlegend=False,
+        ))
+    merged = go.Figure(data=data, layout=fig.layout)
+    merged.update_layout(showlegend=False)
+    return merged
+
+
+def plotly_chart(payload: FigurePayload, use_container_width: bool=False, theme: str='streamlit',
+                 key: str=None, dg=None):
+    import streamlit as st
+
+    dg = dg if dg is not None else st._main
+    with trace('plotly_chart'):
+        return _plotly_chart(payload, use_container_width, theme, key, dg)
+
+
+def _plotly_chart(payload: FigurePayload, use_container_width: bool, theme: str, key: str, dg):
+    try:
+        from streamlit.elements.lib.form_utils import current_form_id
+        from streamlit.elements.lib.utils import compute_and_register_element_id
+        from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    except ImportError:  # Streamlit internals moved; encode the figure the usual way
+        return dg.plotly_chart(json.loads(payload.spec), use_container_width, theme=theme, key=key)
+
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = theme or ''
+    proto.form_id = current_form_id(dg)
+    proto.spec = payload.spec
+    proto.config = json.dumps({'showLink': False, 'linkText': False})
+    proto.id = compute_and_register_element_id(
+        'plotly_chart',
+        user_key=key,
+        form_id=proto.form_id,
+        plotly_spec=payload.digest,
+        plotly_config=proto.config,
+        selection_mode=('points', 'box', 'lasso'),
+        is_selection_activated=False,
+        theme=theme,
+        use_container_width=use_container_width,
+    )
+    return dg._enqueue('plotly_chart', proto)
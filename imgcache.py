@@ -0,0 +1,120 @@
+# Matplotlib figures rasterized once and served as image bytes.
+#
+# st.pyplot() calls savefig() on every render, and Streamlit then shrinks the 200 dpi
+# image to its maximum content width. Here each figure is rasterized once per data
+# version, with the same savefig options and already at that width. The result is stored
+# on disk under a key derived from the figure's name, the data versions and the
+# arguments, so every worker process on the host can share it. A missing entry is
+# rendered by a single background worker, shared by every ImageCache in the process:
+# pyplot is not thread-safe, and concurrent sessions asking for the same image wait on
+# the same job.
+
+import base64
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from datafiles import CACHE_DIR
+from profiling import traced
+
+IMAGE_DIR = CACHE_DIR / 'images'
+# Streamlit resizes anything wider than this on every render.
+MAX_WIDTH = 1460
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+
+# One render worker and one table of pending jobs for the whole process.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='imgcache')
+_pending = {}
+_lock = threading.Lock()
+
+
+def image_key(name: str, versions=(), args=(), format: str='png') -> str:
+    identity = json.dumps([name, list(versions), list(args), format], default=str)
+    return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+
+@traced()
+def rasterize(fig, format: str='png', max_width: int=MAX_WIDTH) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', **SAVEFIG_OPTIONS)
+    image = Image.open(buffer)
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, int(image.height * max_width / image.width)), resample=Image.BILINEAR)
+    elif format == 'png':
+        return buffer.getvalue()
+    out = io.BytesIO()
+    image.save(out, format=format.upper())
+    return out.getvalue()
+
+
+class ImageCache:
+
+    def __init__(self, root=IMAGE_DIR, format: str='png') -> None:
+        self.root = root
+        self.format = format
+
+    def path(self, key: str):
+        return self.root / key[:2] / f'{key}.{self.format}'
+
+    def key(self, name: str, versions=(), args=()) -> str:
+        return image_key(name, versions, args, self.format)
+
+    def get(self, key: str) -> bytes:
+        path = self.path(key)
+        return path.read_bytes() if path.exists() else None
+
+    def render(self, key: str, build, *args) -> bytes:
+        import matplotlib.pyplot as plt
+
+        fig = build(*args)
+        data = rasterize(fig, self.format)
+        # The figure may still be cached by its factory; pyplot need not keep it as well.
+        plt.close(fig)
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        return data
+
+    def submit(self, key: str, build, *args) -> Future:
+        job = (str(self.root), key, self.format)
+        with _lock:
+            future = _pending.get(job)
+            if future is None:
+                future = _executor.submit(self.render, key, build, *args)
+                _pending[job] = future
+                future.add_done_callback(lambda _: _pop(job))
+            return future
+
+    def prune(self, keep) -> int:
+        keep = set(keep)
+        stale = [path for path in self.root.glob(f'*/*.{self.format}') if path not in keep]
+        for path in stale:
+            path.unlink()
+        return len(stale)
+
+    def fetch(self, name: str, build, versions=(), args=()) -> bytes:
+        key = self.key(name, versions, args)
+        data = self.get(key)
+        return data if data is not None else self.submit(key, build, *args).result()
+
+
+def _pop(job) -> None:
+    with _lock:
+        _pending.pop(job, None)
+
+
+def show(data: bytes, format: str='png', dg=None):
+    import streamlit as st
+
+    dg = dg if dg is not None else st
+    if format == 'png':
+        # Already PNG and within the content width, so Streamlit passes the bytes through.
+        return dg.image(data, output_format='PNG', use_container_width=True)
+    # Streamlit would re-encode other formats as PNG; a data URI is sent as it is.
+    return dg.image(f'data:image/{format};base64,{base64.b64encode(data).decode()}', use_container_width=True)
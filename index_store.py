@@ -0,0 +1,233 @@
+# Incremental ingestion of sp500_index.csv into a typed, append-only store.
+#
+# The store remembers how many bytes of the CSV it has consumed and a digest of them.
+# On refresh, if those bytes are unchanged, only the bytes after them are parsed and
+# written as a new Arrow part; the derived state (trend regression sums and the
+# downsampled plot series) is updated from the new rows alone. Checking the digest reads
+# the consumed bytes again but parses none of them. Any other change to the file, such
+# as an edited row, rebuilds the store from scratch.
+#
+# The state file lists the parts that make up the store and is replaced atomically, so
+# it is the commit point: a part is written under a new name first and only counts once
+# the state naming it is saved, and compaction writes the merged part, switches the
+# state over to it and only then deletes the parts it replaced. Files a crash left
+# behind are never read, and are removed by the next refresh. Readers take the file
+# lock shared, so a compaction in another worker cannot delete a part under them.
+
+import hashlib
+import io
+import json
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from datafiles import CACHE_DIR, INDEX_CSV
+from downsample import POINT_BUDGET, lttb_indices
+from profiling import trace
+from trend import TrendStats
+
+STORE_DIR = CACHE_DIR / 'index'
+MAX_PARTS = 64
+
+
+def _days(dates, origin) -> np.ndarray:
+    return ((pd.DatetimeIndex(dates) - pd.Timestamp(origin)) / pd.Timedelta(days=1)).to_numpy()
+
+
+class IndexStore:
+
+    def __init__(self, csv_path=INDEX_CSV, root=STORE_DIR, max_points: int=POINT_BUDGET) -> None:
+        self.csv_path = csv_path
+        self.root = root
+        self.max_points = max_points
+        self.state = self._load_state()
+        self._lock = threading.Lock()
+
+    # -- persistence -------------------------------------------------------------------
+
+    @property
+    def _state_path(self):
+        return self.root / 'state.json'
+
+    def _load_state(self) -> dict:
+        if self._state_path.exists():
+            return json.loads(self._state_path.read_text())
+        return {}
+
+    @contextmanager
+    def _locked(self, shared: bool=False):
+        # Sessions in this process share the lock; other worker processes share the file lock.
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / '.lock', 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self.state = self._load_state()
+                yield
+
+    def _save_state(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.state))
+        tmp_path.replace(self._state_path)
+
+    def _parts(self) -> list:
+        """The committed parts, oldest first."""
+        return [self.root / name for name in self.state.get('parts', [])]
+
+    def _write_part(self, table: pa.Table) -> str:
+        # A fresh name, so a part a crash left uncommitted is never mistaken for a new one.
+        name = f'part-{uuid.uuid4().hex}.arrow'
+        tmp_path = self.root / f'{name}.tmp'
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        tmp_path.replace(self.root / name)
+        return name
+
+    def _remove_stale(self) -> None:
+        committed = set(self.state.get('parts', []))
+        for path in self.root.glob('part-*'):
+            if path.name not in committed:
+                path.unlink(missing_ok=True)
+
+    def _compact(self) -> None:
+        parts = self._parts()
+        if len(parts) <= MAX_PARTS:
+            return
+        name = self._write_part(_concat(parts))
+        self.state['parts'] = [name]
+        self._save_state()
+        for part in parts:
+            part.unlink(missing_ok=True)
+
+    # -- ingestion ---------------------------------------------------------------------
+
+    def _parse(self, data: bytes, header: list) -> pd.DataFrame:
+        if not data.strip():
+            return pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'S&P500': pd.Series(dtype='float64')})
+        # Values are always float64, so a part whose closes happen to be whole numbers
+        # has the same schema as the rest.
+        return pd.read_csv(io.BytesIO(data), names=header, header=None, parse_dates=['Date'],
+                           dtype={name: 'float64' for name in header if name != 'Date'})
+
+    def _unchanged_prefix(self, f):
+        """A hash of the consumed bytes, to carry on with, if they are unchanged; else None."""
+        offset = self.state.get('offset')
+        if not offset or 'prefix' not in self.state:
+            return None
+        f.seek(0)
+        sha = hashlib.sha256(f.read(offset))
+        return sha if sha.hexdigest() == self.state['prefix'] else None
+
+    def refresh(self) -> int:
+        """Ingest rows appended since the last refresh; returns how many were added."""
+        with self._locked(), trace('index refresh'):
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        with open(self.csv_path, 'rb') as f:
+            size = f.seek(0, io.SEEK_END)
+            # Stores from before parts and the prefix digest were kept in the state are rebuilt.
+            sha = None
+            if 'parts' in self.state and size >= self.state['offset']:
+                sha = self._unchanged_prefix(f)
+            if sha is not None:
+                f.seek(self.state['offset'])
+                data = f.read(size - self.state['offset'])
+                header = self.state['header']
+                offset = self.state['offset']
+            else:
+                self.rebuild()
+                f.seek(0)
+                data = f.read(size)
+                header_line, _, data = data.partition(b'\n')
+                header = header_line.decode().strip().split(',')
+                offset = len(header_line) + 1
+                sha = hashlib.sha256(header_line + b'\n')
+                self.state = {'header': header, 'offset': offset, 'prefix': sha.hexdigest(), 'parts': []}
+
+        # Only complete lines are consumed; a half-written last row waits for the next refresh.
+        end = data.rfind(b'\n') + 1
+        data = data[:end]
+        rows = self._parse(data, header)
+        if rows.empty:
+            self._save_state()
+            return 0
+
+        sha.update(data)
+        self.state['offset'] = offset + len(data)
+        self.state['prefix'] = sha.hexdigest()
+        self.state['parts'].append(self._write_part(pa.Table.from_pandas(rows, preserve_index=False)))
+        self._update_derived(rows)
+        self._save_state()
+        self._remove_stale()
+        self._compact()
+        return len(rows)
+
+    def rebuild(self) -> None:
+        # The parts are removed once a state without them is saved, by _remove_stale().
+        self.state = {}
+
+    # -- derived state -----------------------------------------------------------------
+
+    def _update_derived(self, rows: pd.DataFrame) -> None:
+        values = rows['S&P500'].to_numpy(dtype=np.float64)
+        origin = self.state.setdefault('origin', rows.Date.iloc[0].isoformat())
+
+        trend = TrendStats.from_dict(self.state.get('trend', {}))
+        trend.update(_days(rows.Date, origin), values)
+        self.state['trend'] = trend.to_dict()
+
+        self.state['last_date'] = rows.Date.iloc[-1].isoformat()
+
+        # New points are appended to the plot series; once it holds twice the budget it
+        # is reduced again, so the cost stays proportional to the budget, not the history.
+        plot = self.state.get('plot', [])
+        plot += [[date.isoformat(), value] for date, value in zip(rows.Date, values.tolist())]
+        if self.max_points and len(plot) > 2 * self.max_points:
+            dates = pd.to_datetime([point[0] for point in plot])
+            keep = lttb_indices(dates, [point[1] for point in plot], self.max_points)
+            plot = [plot[i] for i in keep]
+        self.state['plot'] = plot
+
+    # -- readers -----------------------------------------------------------------------
+
+    def frame(self, columns=None) -> pd.DataFrame:
+        with self._locked(shared=True):
+            parts = self._parts()
+            if not parts:
+                return self._parse(b'', ['Date', 'S&P500'])
+            return _concat(parts, columns).to_pandas()
+
+    def plot_series(self) -> pd.DataFrame:
+        plot = self.state.get('plot', [])
+        return pd.DataFrame({
+            'Date': pd.to_datetime([point[0] for point in plot]),
+            'S&P500': [point[1] for point in plot],
+        })
+
+    def trend(self) -> TrendStats:
+        return TrendStats.from_dict(self.state.get('trend', {}))
+
+    def origin(self) -> pd.Timestamp:
+        return pd.Timestamp(self.state['origin'])
+
+    def covers(self, start=None, end=None) -> bool:
+        """Whether [start, end] takes in every row of the store."""
+        if 'last_date' not in self.state:
+            return False
+        return ((start is None or pd.Timestamp(start) <= self.origin())
+                and (end is None or pd.Timestamp(end) >= pd.Timestamp(self.state['last_date'])))
+
+
+def _concat(parts: list, columns=None) -> pa.Table:
+    return pa.concat_tables(feather.read_table(part, columns=columns, memory_map=True) for part in parts)
@@ -0,0 +1,119 @@
+# Vectorized indicator engine over a (dates x tickers) price matrix.
+#
+# Indicators are named the way stocks.py names its columns: 'SMA_10', 'EMA_50', and
+# 'RET_1' for the one-bar simple return. All requested SMAs come from one cumulative sum
+# of the matrix, each EMA span is one recursive filter over every ticker at once, and
+# duplicate specs are computed once.
+#
+# Missing prices: a ticker's leading NaNs are left as NaN in every output. An SMA window
+# that contains a NaN is NaN, as with pandas' rolling().mean(). For EMAs, interior gaps
+# carry the last price forward.
+
+import numpy as np
+import pandas as pd
+
+from profiling import lazy_module
+
+signal = lazy_module('scipy.signal')
+
+KINDS = ('SMA', 'EMA', 'RET')
+
+
+def parse_spec(spec) -> tuple:
+    if isinstance(spec, str):
+        kind, window = spec.upper().rsplit('_', 1)
+        spec = (kind, window)
+    kind, window = spec
+    kind, window = kind.upper(), int(window)
+    if kind not in KINDS or window < 1:
+        raise ValueError(f'unknown indicator spec: {spec!r}')
+    return kind, window
+
+
+def _sma(values: np.ndarray, windows) -> dict:
+    n = values.shape[0]
+    missing = np.isnan(values)
+    # Centre each column before summing so the running sum stays small.
+    count = np.maximum((~missing).sum(axis=0), 1)
+    centre = np.where(missing, 0.0, values).sum(axis=0) / count
+    filled = np.where(missing, 0.0, values - centre)
+    sums = np.zeros((n + 1,) + values.shape[1:])
+    np.cumsum(filled, axis=0, out=sums[1:])
+    gaps = np.zeros((n + 1,) + values.shape[1:], dtype=np.int64)
+    np.cumsum(missing, axis=0, out=gaps[1:])
+
+    out = {}
+    for window in windows:
+        sma = np.full(values.shape, np.nan)
+        if window <= n:
+            window_sum = sums[window:] - sums[:-window]
+            window_gaps = gaps[window:] - gaps[:-window]
+            sma[window - 1:] = np.where(window_gaps == 0, window_sum / window + centre, np.nan)
+        out[window] = sma
+    return out
+
+
+def _ema(values: np.ndarray, spans) -> dict:
+    # Forward-fill interior gaps; leading NaNs stay NaN and are masked back in below.
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    leading = np.isnan(filled)
+    first = np.argmax(~leading, axis=0)
+    # Seed each column with its first observed price, as ewm(adjust=False) does.
+    seed = filled[first, np.arange(filled.shape[1])]
+    seed = np.where(np.isnan(seed), 0.0, seed)
+    filled = np.where(leading, seed, filled)
+
+    out = {}
+    for span in spans:
+        alpha = 2 / (span + 1)
+        zi = ((1 - alpha) * seed)[np.newaxis, :]
+        ema, _ = signal.lfilter([alpha], [1, alpha - 1], filled, axis=0, zi=zi)
+        # alpha * seed + (1 - alpha) * seed can be off by one ulp, differently per span,
+        # which would order the EMAs of a series on its first bar; pin it to the seed.
+        ema[first, np.arange(filled.shape[1])] = seed
+        ema[leading] = np.nan
+        out[span] = ema
+    return out
+
+
+def _returns(values: np.ndarray, periods) -> dict:
+    out = {}
+    for period in periods:
+        ret = np.full(values.shape, np.nan)
+        if period < values.shape[0]:
+            ret[period:] = values[period:] / values[:-period] - 1
+        out[period] = ret
+    return out
+
+
+def compute_array(values: np.ndarray, specs, dtype=np.float64):
+    """Return (names, array) with array shaped (len(names), dates, tickers)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    specs = list(dict.fromkeys(parse_spec(spec) for spec in specs))
+    windows = {kind: sorted({w for k, w in specs if k == kind}) for kind in KINDS}
+
+    results = {
+        'SMA': _sma(values, windows['SMA']) if windows['SMA'] else {},
+        'EMA': _ema(values, windows['EMA']) if windows['EMA'] else {},
+        'RET': _returns(values, windows['RET']) if windows['RET'] else {},
+    }
+    out = np.empty((len(specs),) + values.shape, dtype=dtype)
+    for i, (kind, window) in enumerate(specs):
+        out[i] = results[kind][window]
+    return [f'{kind}_{window}' for kind, window in specs], out
+
+
+def compute(prices: pd.DataFrame, specs, dtype=np.float64) -> pd.DataFrame:
+    """Indicators for every column of `prices`, as a frame with (indicator, ticker) columns."""
+    names, out = compute_array(prices.to_numpy(), specs, dtype=dtype)
+    columns = pd.MultiIndex.from_product([names, prices.columns], names=['Indicator', 'Ticker'])
+    flat = out.transpose(1, 0, 2).reshape(len(prices), -1)
+    return pd.DataFrame(flat, index=prices.index, columns=columns)
+
+
+def for_series(prices: pd.Series, specs) -> pd.DataFrame:
+    """Indicators for a single price series, one column per indicator."""
+    names, out = compute_array(prices.to_numpy(), specs)
+    return pd.DataFrame(out[:, :, 0].T, index=prices.index, columns=names)
@@ -0,0 +1,215 @@
+# Live bars: a fixed-size window of OHLCV bars with indicators updated bar by bar.
+#
+# LiveBars keeps the latest `capacity` bars and their indicator values in one
+# preallocated ring buffer. It is seeded from a history frame: the indicator engine
+# computes the history once, and from then on every new bar updates each indicator in
+# O(1): an SMA by adding the new close to a running window sum and dropping the one that
+# leaves the window, an EMA by one step of its recursion, a return from the close
+# `period` bars back. A bar with the same timestamp as the latest one revises it, as
+# a live feed does while a bar is still forming; its state is rolled back to the
+# previous bar before the revision is applied. The semantics match indicators.py,
+# including NaN closes, and the window sums are recomputed from the buffer each time
+# it wraps so rounding cannot accumulate.
+#
+# A feed is any iterable of Bar: polling_feed() polls a fetch function such as
+# barstore.yahoo_history, and simulated_feed() produces a random walk for tests.
+
+import time as _time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+CAPACITY = 2048
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class Bar(NamedTuple):
+    time: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class LiveBars:
+
+    def __init__(self, history: pd.DataFrame, specs=(), capacity: int=CAPACITY) -> None:
+        self.specs = list(dict.fromkeys(indicators.parse_spec(spec) for spec in specs))
+        self.names = [f'{kind}_{window}' for kind, window in self.specs]
+        longest = max((window for _, window in self.specs), default=0)
+        if capacity <= longest:
+            raise ValueError(f'capacity {capacity} must exceed the longest window, {longest}')
+        self.capacity = capacity
+        self.columns = OHLCV + self.names
+        self.tz = history.index.tz
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(self.columns)), np.nan)
+        # Bars appended so far, including the seeded ones; the latest is at (count - 1) % capacity.
+        self.count = 0
+
+        self._sma = [(i, window) for i, (kind, window) in enumerate(self.specs) if kind == 'SMA']
+        self._ema = [(i, 2 / (window + 1)) for i, (kind, window) in enumerate(self.specs) if kind == 'EMA']
+        self._ret = [(i, window) for i, (kind, window) in enumerate(self.specs) if kind == 'RET']
+        self._state = self._empty_state()
+        self._previous = None
+        self._seed(history)
+
+    def _empty_state(self) -> dict:
+        return {
+            'sums': np.zeros(len(self._sma)),
+            'gaps': np.zeros(len(self._sma), dtype=np.int64),
+            'ema': np.full(len(self._ema), np.nan),
+            'last_close': np.nan,
+        }
+
+    def _seed(self, history: pd.DataFrame) -> None:
+        if history.empty:
+            return
+        # The latest bar goes through update(), so a feed can revise it like any other.
+        history, latest = history.iloc[:-1], next(_bars(history.iloc[-1:]))
+        if history.empty:
+            self.update(latest)
+            return
+        close = history['Close']
+        computed = indicators.for_series(close, self.specs) if self.specs else None
+        tail = history.iloc[-self.capacity:]
+        n = len(tail)
+        self.times[:n] = tail.index.asi8 if self.tz is None else tail.index.tz_convert('UTC').asi8
+        self.values[:n, :len(OHLCV)] = tail.reindex(columns=OHLCV).to_numpy(dtype=np.float64)
+        if computed is not None:
+            self.values[:n, len(OHLCV):] = computed.to_numpy()[-n:]
+        self.count = n
+        if self._ema:
+            self._state['ema'] = computed.iloc[-1, [i for i, _ in self._ema]].to_numpy(dtype=np.float64)
+        observed = close.dropna()
+        self._state['last_close'] = observed.iat[-1] if len(observed) else np.nan
+        self._resync()
+        self.update(latest)
+
+    def _close(self, lag: int) -> float:
+        """The close `lag` bars before the latest one, NaN before the first bar."""
+        if lag >= self.count:
+            return np.nan
+        return self.values[(self.count - 1 - lag) % self.capacity, 3]
+
+    def _resync(self) -> None:
+        for j, (_, window) in enumerate(self._sma):
+            closes = np.array([self._close(lag) for lag in range(min(window, self.count))])
+            self._state['sums'][j] = np.nansum(closes)
+            self._state['gaps'][j] = np.isnan(closes).sum()
+
+    def _timestamp(self, time) -> int:
+        stamp = pd.Timestamp(time)
+        if stamp.tzinfo is None and self.tz is not None:
+            stamp = stamp.tz_localize(self.tz)
+        return stamp.value
+
+    def update(self, bar: Bar) -> dict:
+        """Append or revise one bar; returns its row, or None for a bar older than the latest."""
+        stamp = self._timestamp(bar.time)
+        latest = self.times[(self.count - 1) % self.capacity] if self.count else None
+        if latest is not None and stamp < latest:
+            return None
+        if latest is not None and stamp == latest:
+            # Roll the indicators back to the previous bar, then apply the revision.
+            self._state = {key: np.copy(value) for key, value in self._previous.items()}
+        else:
+            self.count += 1
+            self._previous = {key: np.copy(value) for key, value in self._state.items()}
+        slot = (self.count - 1) % self.capacity
+        self.times[slot] = stamp
+        row = self.values[slot]
+        row[:len(OHLCV)] = bar.open, bar.high, bar.low, bar.close, bar.volume
+        self._apply(row, bar.close)
+        if slot == self.capacity - 1 and stamp != latest:
+            self._resync()
+        return dict(zip(['Date'] + self.columns, [self.timestamp(slot)] + row.tolist()))
+
+    def _apply(self, row: np.ndarray, close: float) -> None:
+        state = self._state
+        offset = len(OHLCV)
+        missing = np.isnan(close)
+        for j, (i, window) in enumerate(self._sma):
+            leaving = self._close(window)
+            if self.count > window:
+                if np.isnan(leaving):
+                    state['gaps'][j] -= 1
+                else:
+                    state['sums'][j] -= leaving
+            if missing:
+                state['gaps'][j] += 1
+            else:
+                state['sums'][j] += close
+            full = self.count >= window and state['gaps'][j] == 0
+            row[offset + i] = state['sums'][j] / window if full else np.nan
+
+        if not missing:
+            state['last_close'] = close
+        price = state['last_close']
+        for j, (i, alpha) in enumerate(self._ema):
+            ema = state['ema'][j]
+            # The first observed close seeds the average, as ewm(adjust=False) does.
+            state['ema'][j] = price if np.isnan(ema) else alpha * price + (1 - alpha) * ema
+            row[offset + i] = state['ema'][j]
+
+        for i, period in self._ret:
+            row[offset + i] = close / self._close(period) - 1
+
+    def consume(self, feed, limit: int=None):
+        """Apply bars from `feed`, yielding the updated row after each; stops after `limit` bars."""
+        for n, bar in enumerate(feed):
+            if limit is not None and n >= limit:
+                return
+            row = self.update(bar)
+            if row is not None:
+                yield row
+
+    def timestamp(self, slot: int) -> pd.Timestamp:
+        stamp = pd.Timestamp(self.times[slot], tz='UTC')
+        return stamp.tz_convert(self.tz) if self.tz is not None else stamp.tz_localize(None)
+
+    def frame(self) -> pd.DataFrame:
+        """The buffered bars, oldest first."""
+        n = min(self.count, self.capacity)
+        order = np.arange(self.count - n, self.count) % self.capacity
+        index = pd.DatetimeIndex(self.times[order], tz='UTC')
+        index = index.tz_convert(self.tz) if self.tz is not None else index.tz_localize(None)
+        return pd.DataFrame(self.values[order], index=index.rename('Date'), columns=self.columns)
+
+
+def _bars(frame: pd.DataFrame):
+    for time, row in zip(frame.index, frame.reindex(columns=OHLCV).itertuples(index=False)):
+        yield Bar(time, *row)
+
+
+def polling_feed(fetch, ticker: str, interval: str='1m', since=None, every: float=60.0, sleep=_time.sleep):
+    """Poll `fetch` (barstore.yahoo_history's signature) for bars from the latest one on."""
+    while True:
+        bars = fetch(ticker, interval, start=since, end=None, period=None if since is not None else '1d')
+        if since is not None:
+            bars = bars[bars.index >= since]
+        yield from _bars(bars)
+        if not bars.empty:
+            # The latest bar may still be forming, so the next poll asks for it again.
+            since = bars.index[-1]
+        sleep(every)
+
+
+def simulated_feed(start: Bar, interval: str='1min', ticks_per_bar: int=4, volatility: float=0.001, seed: int=0):
+    """A random walk from `start`: each bar is revised `ticks_per_bar` times, then the next opens."""
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(interval)
+    time, price = pd.Timestamp(start.time), start.close
+    while True:
+        time += step
+        open_ = high = low = price
+        volume = 0.0
+        for _ in range(ticks_per_bar):
+            price *= np.exp(rng.normal(0.0, volatility))
+            high, low = max(high, price), min(low, price)
+            volume += float(rng.integers(100, 10_000))
+            yield Bar(time, open_, high, low, price, volume)
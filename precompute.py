@@ -0,0 +1,123 @@
+# Builds everything the pages need ahead of the first visitor.
+#
+# `python precompute.py` (or precompute.run()) refreshes the Arrow snapshots and the
+# index store, then builds every derived table, Plotly payload and Matplotlib image the
+# pages ask for in a process pool, and writes them to the shared cache directory:
+# tables and payloads to the artifact store, images to the image cache. The wrappers in
+# app_cache look there first, so Streamlit workers started afterwards serve the pages
+# without computing anything. Entries that already exist for the current data version
+# are skipped; run it again whenever the CSVs change. With --tickers, stock bars are
+# fetched into the bar store and the stock charts rasterized as well.
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from artifacts import ArtifactStore
+from datafiles import file_version
+from figcache import serialize
+from imgcache import ImageCache
+
+TABLES = ['companies', 'company_text', 'prepared_companies', 'index', 'correlation_matrix',
+          'mega_cap_df', 'large_cap_df', 'screener']
+FIGURES = ['fig_mcap_sector', 'fig_mcap_outliers', 'fig_Ebitda', 'fig_Revenue', 'fig_revenue_ebitda_cap',
+           'fig_mega_large_cap']
+IMAGES = ['cor_fig', 'fig_hist_mega_cap', 'fig_hist_large_cap']
+STOCK_IMAGES = ['fig_price_volume_change', 'fig_moving_averages', 'fig_return']
+SECTOR_VALUES = ['Marketcap', 'Ebitda', 'Revenuegrowth']
+
+
+def tasks(tickers=()) -> list:
+    """(kind, name, args) for every entry the pages request with their default widgets."""
+    import source
+
+    todo = [('table', name, ()) for name in TABLES]
+    todo += [('table', 'sector_summary', (value,)) for value in SECTOR_VALUES]
+    todo += [('figure', name, ()) for name in FIGURES]
+    # The date-range slider starts at the full range of the index.
+    dates = source.index().Date.dt.date
+    todo += [('figure', 'fig_index', (dates.min(), dates.max()))]
+    todo += [('figure', 'fig_sector_drilldown', (sector, value))
+             for value in SECTOR_VALUES for sector in sorted(source.sector_summary(value).Sector.unique())]
+    todo += [('image', name, ()) for name in IMAGES]
+    todo += [('stock', ticker, ()) for ticker in tickers]
+    return todo
+
+
+def build(kind: str, name: str, args=(), force: bool=False) -> list:
+    """Build one entry and return the paths it was written to."""
+    if kind == 'stock':
+        import stocks
+
+        paths = []
+        for figure_name in STOCK_IMAGES:
+            figure = getattr(stocks, figure_name)
+            key = stocks.png_key(figure, name)
+            if force or stocks.images.get(key) is None:
+                stocks.images.render(key, figure, name, stocks.POINT_BUDGET)
+            paths.append(stocks.images.path(key))
+        return paths
+
+    import source
+
+    func = getattr(source, name)
+    versions = tuple(file_version(path) for path in func.paths)
+    if kind == 'image':
+        images = ImageCache()
+        key = images.key(name, versions, args)
+        if force or images.get(key) is None:
+            images.render(key, func, *args)
+        return [images.path(key)]
+
+    store = ArtifactStore()
+    path = store.path(name, versions, args)
+    if force or not path.exists():
+        value = func(*args)
+        store.put(name, versions, args, serialize(value) if kind == 'figure' else value)
+    return [path]
+
+
+def run(tickers=(), max_workers: int=None, force: bool=False, prune: bool=False, log=print) -> dict:
+    """Run the pipeline for the current data version; returns {task: paths or exception}."""
+    import source
+    from snapshot import build_snapshots
+
+    build_snapshots()
+    source.index_store.refresh()
+
+    results = {}
+    with ProcessPoolExecutor(max_workers) as pool:
+        started = time.perf_counter()
+        futures = {pool.submit(build, *task, force): task for task in tasks(tickers)}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                results[task] = future.result()
+            except Exception as error:
+                results[task] = error
+            log(f'{time.perf_counter() - started:7.2f}s  {task[0]:6}  {task[1]}{task[2] or ""}'
+                + (f'  FAILED: {results[task]!r}' if isinstance(results[task], Exception) else ''))
+
+    if prune:
+        written = {path for paths in results.values() if not isinstance(paths, Exception) for path in paths}
+        removed = ArtifactStore().prune(written) + ImageCache().prune(written)
+        log(f'pruned {removed} stale entries')
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Precompute the tables, figures and images of the app.')
+    parser.add_argument('--tickers', nargs='*', default=[], help='also fetch bars and render charts for these tickers')
+    parser.add_argument('--workers', type=int, default=None, help='size of the process pool')
+    parser.add_argument('--force', action='store_true', help='rebuild entries that already exist')
+    parser.add_argument('--prune', action='store_true', help='delete cached entries this run did not build, e.g. of older data versions')
+    args = parser.parse_args(argv)
+    results = run(args.tickers, args.workers, args.force, args.prune)
+    failed = [task for task, paths in results.items() if isinstance(paths, Exception)]
+    print(f'{len(results) - len(failed)} built, {len(failed)} failed')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# Startup profiling: deferred imports of heavy libraries, per-page render timings and
+# per-stage tracing.
+#
+# lazy_module('matplotlib.pyplot') returns a stand-in that imports the real module on
+# first attribute access and records how long that import took, so a page pays for
+# matplotlib, seaborn, plotly or scikit-learn only once it draws a chart that needs
+# them. A page script runs its body inside `with page_timer(page):`, which records the
+# first and latest render time of each page. Both are
+# shown in the sidebar by show_timings() when SP500_PROFILE=1 is set or the page is
+# opened with ?profile=1.
+#
+# With SP500_TRACE=1, trace('stage') (a context manager) and @traced (a decorator)
+# record the wall time, CPU time of the calling thread and change in memory of every
+# pipeline stage, with the Streamlit session that ran it. Memory is the change in the
+# process's resident set; SP500_TRACE=memory measures allocations with tracemalloc
+# instead, at a noticeable cost. Spans are kept in memory, appended to SP500_TRACE_FILE
+# as JSON lines if set. The diagnostics view shows them, every session's included, so it
+# is off unless the server runs with SP500_DIAGNOSTICS=1; then any page opened with
+# ?diagnostics=1 renders it. Without SP500_TRACE, traced functions are left undecorated
+# and trace() returns a shared no-op.
+
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+IMPORT_TIMES = {}
+RENDER_TIMES = {}
+_lock = threading.Lock()
+
+TRACING = os.environ.get('SP500_TRACE', '0') not in ('', '0')
+TRACE_MEMORY = os.environ.get('SP500_TRACE') == 'memory'
+TRACE_FILE = os.environ.get('SP500_TRACE_FILE')
+SPANS = deque(maxlen=int(os.environ.get('SP500_TRACE_LIMIT', 10000)))
+_local = threading.local()
+
+if TRACE_MEMORY:
+    import tracemalloc
+
+    tracemalloc.start()
+
+
+def timed_import(name: str):
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule:
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def _memory() -> int:
+    if TRACE_MEMORY:
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _session():
+    # Only asks Streamlit when it is already loaded; precompute and notebooks have no sessions.
+    scriptrunner = sys.modules.get('streamlit.runtime.scriptrunner')
+    if scriptrunner is None:
+        return None
+    ctx = scriptrunner.get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+class _Span:
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> '_Span':
+        stack = _local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1] if stack else None
+        stack.append(self.stage)
+        self.started = time.time()
+        self.memory = _memory()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        _local.stack.pop()
+        span = {
+            'stage': self.stage,
+            'parent': self.parent,
+            'session': _session(),
+            'thread': threading.current_thread().name,
+            'pid': os.getpid(),
+            'started': self.started,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'mem_bytes': _memory() - self.memory,
+            'error': exc[0].__name__ if exc[0] is not None else None,
+        }
+        SPANS.append(span)
+        if TRACE_FILE:
+            with _lock, open(TRACE_FILE, 'a') as f:
+                f.write(json.dumps(span) + '\n')
+
+
+class _NoSpan:
+
+    def __enter__(self) -> '_NoSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def trace(stage: str):
+    return _Span(stage) if TRACING else _NO_SPAN
+
+
+def traced(stage: str=None):
+    """Decorator form of trace(); the stage defaults to the function's name."""
+    def decorator(func):
+        if not TRACING:
+            return func
+        from functools import wraps
+
+        name = stage or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def export_jsonl(spans=None) -> str:
+    return ''.join(json.dumps(span) + '\n' for span in (SPANS if spans is None else spans))
+
+
+class page_timer:
+    """Wraps a page script's body; a render that completes is recorded.
+
+    Streamlit stops a run midway by raising (a widget changed, st.stop()); the page's
+    span is closed either way, so it is recorded with the exception's name and the span
+    stack of the reused script thread stays balanced.
+    """
+
+    def __init__(self, page: str) -> None:
+        self.page = page
+        self.elapsed = None
+
+    def __enter__(self) -> 'page_timer':
+        self.span = trace(f'page {self.page}')
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.span.__exit__(*exc)
+        if exc[0] is not None:
+            return
+        self.elapsed = time.perf_counter() - self.start
+        with _lock:
+            entry = RENDER_TIMES.setdefault(self.page, {'first': self.elapsed, 'runs': 0})
+            entry['last'] = self.elapsed
+            entry['runs'] += 1
+
+
+def enabled() -> bool:
+    if os.environ.get('SP500_PROFILE') == '1':
+        return True
+    import streamlit as st
+
+    return st.query_params.get('profile') == '1'
+
+
+def show_timings() -> None:
+    show_diagnostics()
+    if not enabled():
+        return
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander('Startup timings', expanded=True):
+        st.write('**Imports** (seconds, first import in this process)')
+        st.dataframe(pd.Series(IMPORT_TIMES, name='seconds', dtype='float64').sort_values(ascending=False))
+        st.write('**Page renders** (seconds)')
+        st.dataframe(pd.DataFrame.from_dict(RENDER_TIMES, orient='index'))
+
+
+def show_diagnostics() -> None:
+    import streamlit as st
+
+    if os.environ.get('SP500_DIAGNOSTICS') != '1' or st.query_params.get('diagnostics') != '1':
+        return
+    import pandas as pd
+
+    st.divider()
+    st.header('Diagnostics')
+    if not TRACING:
+        st.info('Stage tracing is off. Start the app with SP500_TRACE=1 to record it.')
+        return
+    spans = pd.DataFrame(list(SPANS))
+    if spans.empty:
+        st.write('No stages recorded yet.')
+        return
+    session = _session()
+    st.write(f'{len(spans)} stages recorded in this process; this session is `{session}`.')
+    columns = {'wall_s': ['count', 'sum', 'mean', 'max'], 'cpu_s': ['sum'], 'mem_bytes': ['sum']}
+    st.subheader('Per stage')
+    st.dataframe(spans.groupby('stage').agg(columns).sort_values(('wall_s', 'sum'), ascending=False))
+    st.subheader('Per session')
+    pages = spans[spans.stage.str.startswith('page ')]
+    st.dataframe(pages.groupby('session', dropna=False).agg(columns))
+    st.subheader('This session, latest first')
+    st.dataframe(spans[spans.session == session].iloc[::-1], hide_index=True)
+    st.download_button('Export JSON lines', export_jsonl(), file_name='sp500-trace.jsonl',
+                       mime='application/x-ndjson')
@@ -0,0 +1,70 @@
+# OHLCV bars aggregated to coarser intervals.
+#
+# Yahoo serves every interval as a separate download, so weekly bars for a chart and
+# daily bars for the indicators would fetch the same history twice. resample_ohlcv()
+# derives the coarser bars locally instead: the first Open, highest High, lowest Low and
+# last Close of each bucket, and the summed Volume. Buckets follow Yahoo's: intraday bars
+# start at the session open (9:30, 10:30, ... for hourly bars on a US exchange), days at
+# local midnight, weeks on Monday, months and quarters on their first day. Buckets
+# without any bar, such as weekends, are dropped. Interval names are Yahoo's, with '1w'
+# and '1M' accepted for '1wk' and '1mo'.
+
+import numpy as np
+import pandas as pd
+
+INTERVALS = ['1m', '2m', '5m', '15m', '30m', '1h', '90m', '1d', '1wk', '1mo', '3mo']
+ALIASES = {'60m': '1h', '1w': '1wk', '1M': '1mo', '3M': '3mo'}
+# Length in minutes of the intervals that nest inside a day.
+MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '1h': 60, '90m': 90, '1d': 1440}
+RULES = {**{name: f'{minutes}min' for name, minutes in MINUTES.items()},
+         '1d': 'D', '1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+
+
+def normalize(interval: str) -> str:
+    interval = ALIASES.get(interval, interval)
+    if interval not in RULES:
+        raise ValueError(f'unknown interval {interval!r}, expected one of {INTERVALS}')
+    return interval
+
+
+def can_derive(fine: str, coarse: str) -> bool:
+    """Whether every `coarse` bucket is a union of whole `fine` buckets."""
+    fine, coarse = normalize(fine), normalize(coarse)
+    if fine == coarse:
+        return True
+    if fine in MINUTES and coarse in MINUTES:
+        return MINUTES[coarse] % MINUTES[fine] == 0 and MINUTES[coarse] > MINUTES[fine]
+    if fine in MINUTES:
+        return True
+    # Weeks straddle month boundaries; months add up to quarters.
+    return (fine, coarse) == ('1mo', '3mo')
+
+
+def ohlcv_agg(columns) -> dict:
+    agg = {column: 'last' for column in columns}
+    agg.update({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    return {column: how for column, how in agg.items() if column in columns}
+
+
+def resample_ohlcv(bars: pd.DataFrame, interval: str, offset: pd.Timedelta=None) -> pd.DataFrame:
+    interval = normalize(interval)
+    if bars.empty:
+        return bars
+    # Bucketed on the exchange's wall clock, so days and sessions stay aligned across DST.
+    tz = bars.index.tz
+    wall = bars.index.tz_localize(None) if tz is not None else bars.index
+    options = {}
+    if interval in MINUTES and interval != '1d':
+        if offset is None:
+            minute_of_day = wall.hour * 60 + wall.minute
+            offset = pd.Timedelta(minutes=int(minute_of_day.min() % MINUTES[interval]))
+        options = {'origin': 'start_day', 'offset': offset}
+
+    resampler = bars.set_axis(wall).resample(RULES[interval], label='left', closed='left', **options)
+    merged = resampler.agg(ohlcv_agg(bars.columns))
+    merged = merged[resampler.size().to_numpy() > 0]
+    if tz is not None:
+        merged.index = merged.index.tz_localize(tz, ambiguous=np.ones(len(merged), dtype=bool),
+                                                nonexistent='shift_forward')
+    merged.index.name = bars.index.name
+    return merged
@@ -0,0 +1,130 @@
+# Return statistics for one series or a (dates x tickers) matrix of simple returns.
+#
+# Everything is accumulated in log space: the geometric mean is expm1(mean(log1p(r))),
+# so long or high-frequency series cannot overflow or underflow the way a running
+# product does. NaNs (the first bar of a return series, or days before a ticker
+# listed) are skipped. RunningReturnStats keeps the same statistics incrementally:
+# each new bar updates them in O(1) per ticker without touching history.
+
+import numpy as np
+import pandas as pd
+
+
+def _wrap(values, like):
+    if isinstance(like, pd.DataFrame):
+        return pd.Series(values, index=like.columns)
+    if isinstance(like, pd.Series):
+        return float(values[0])
+    return values
+
+
+def _as_2d(returns) -> np.ndarray:
+    values = np.asarray(returns, dtype=np.float64)
+    return values[:, np.newaxis] if values.ndim == 1 else values
+
+
+def geometric_mean(returns):
+    """Per-period geometric mean of simple returns."""
+    log_returns = np.log1p(_as_2d(returns))
+    count = np.sum(~np.isnan(log_returns), axis=0)
+    total = np.nansum(log_returns, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _wrap(np.expm1(total / count), returns)
+
+
+def volatility(returns, periods_per_year: int=None, ddof: int=1):
+    values = _as_2d(returns)
+    count = np.sum(~np.isnan(values), axis=0)
+    mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+    squares = np.nansum((values - mean) ** 2, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vol = np.sqrt(squares / (count - ddof))
+    if periods_per_year:
+        vol = vol * np.sqrt(periods_per_year)
+    return _wrap(np.where(count > ddof, vol, np.nan), returns)
+
+
+def sharpe_ratio(returns, risk_free: float=0.0, periods_per_year: int=252):
+    """Annualized Sharpe ratio; `risk_free` is the per-period rate."""
+    values = _as_2d(returns) - risk_free
+    count = np.sum(~np.isnan(values), axis=0)
+    mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+    vol = np.asarray(volatility(values), dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _wrap(mean / vol * np.sqrt(periods_per_year), returns)
+
+
+def max_drawdown(returns):
+    """Largest peak-to-trough fall of cumulative wealth, as a negative fraction."""
+    log_wealth = np.nancumsum(np.log1p(_as_2d(returns)), axis=0)
+    # The starting wealth of 1 (log 0) counts as a peak.
+    peak = np.maximum(np.maximum.accumulate(log_wealth, axis=0), 0.0)
+    drawdown = np.expm1(np.min(log_wealth - peak, axis=0, initial=0.0))
+    return _wrap(drawdown, returns)
+
+
+def summary(returns, periods_per_year: int=252) -> pd.DataFrame:
+    """Geometric mean, volatility, Sharpe ratio and max drawdown per ticker."""
+    frame = returns if isinstance(returns, pd.DataFrame) else pd.DataFrame(returns)
+    return pd.DataFrame({
+        'Geometric mean': geometric_mean(frame),
+        'Volatility': volatility(frame),
+        'Annualized volatility': volatility(frame, periods_per_year),
+        'Sharpe ratio': sharpe_ratio(frame, periods_per_year=periods_per_year),
+        'Max drawdown': max_drawdown(frame),
+    }).T
+
+
+class RunningReturnStats:
+    """Streaming version of the statistics above for a fixed set of tickers."""
+
+    def __init__(self, n_tickers: int=1, periods_per_year: int=252) -> None:
+        self.periods_per_year = periods_per_year
+        self.count = np.zeros(n_tickers, dtype=np.int64)
+        self.log_sum = np.zeros(n_tickers)
+        # Welford's running mean and sum of squared deviations of simple returns.
+        self.mean = np.zeros(n_tickers)
+        self.m2 = np.zeros(n_tickers)
+        self.log_wealth = np.zeros(n_tickers)
+        self.log_peak = np.zeros(n_tickers)
+        self.worst_log_drawdown = np.zeros(n_tickers)
+
+    def update(self, returns) -> None:
+        """Add one bar of simple returns, one value per ticker (NaN to skip a ticker)."""
+        r = np.asarray(returns, dtype=np.float64).reshape(-1)
+        seen = ~np.isnan(r)
+        r = np.where(seen, r, 0.0)
+        log_r = np.log1p(r)
+
+        self.count += seen
+        self.log_sum += log_r
+        delta = np.where(seen, r - self.mean, 0.0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * (r - self.mean) * seen
+
+        self.log_wealth += log_r
+        np.maximum(self.log_peak, self.log_wealth, out=self.log_peak)
+        np.minimum(self.worst_log_drawdown, self.log_wealth - self.log_peak, out=self.worst_log_drawdown)
+
+    def update_many(self, returns) -> None:
+        for row in _as_2d(returns):
+            self.update(row)
+
+    @property
+    def geometric_mean(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.expm1(self.log_sum / self.count)
+
+    @property
+    def volatility(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    @property
+    def sharpe_ratio(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.mean / self.volatility * np.sqrt(self.periods_per_year)
+
+    @property
+    def max_drawdown(self) -> np.ndarray:
+        return np.expm1(self.worst_log_drawdown)
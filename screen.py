@@ -0,0 +1,140 @@
+# Screening queries over the company fundamentals table.
+#
+# A Screener is built once per companies table. It keeps the numeric columns as float64
+# arrays, an ascending argsort for each of the sort columns, and a permutation that groups
+# rows by sector and, within a sector, by industry, with the offsets of every group. A range
+# filter is then two binary searches, a top-N query is a slice of a sort order, and a
+# group is a contiguous slice of the grouped numeric block. Queries return row positions
+# (usually views into the indexes); only take() builds a frame, and only of the matching rows.
+
+import numpy as np
+import pandas as pd
+
+SORT_COLUMNS = ('Marketcap', 'Ebitda', 'Revenuegrowth')
+GROUP_LEVELS = ('Sector', 'Industry')
+
+
+class Screener:
+
+    def __init__(self, companies: pd.DataFrame, sort_columns=SORT_COLUMNS, group_levels=GROUP_LEVELS) -> None:
+        self.frame = companies
+        self.columns = companies.select_dtypes('number').columns.tolist()
+        self.values = {column: companies[column].to_numpy(dtype=np.float64) for column in self.columns}
+
+        # NaNs sort last, so the first `valid` positions of an order are the comparable ones.
+        self.order = {}
+        self.descending = {}
+        self.sorted = {}
+        self.valid = {}
+        for column in sort_columns:
+            order = np.argsort(self.values[column], kind='stable')
+            self.order[column] = order
+            # Separate, so ties keep row order in both directions, as in nlargest().
+            self.descending[column] = np.argsort(-self.values[column], kind='stable')
+            self.sorted[column] = self.values[column][order]
+            self.valid[column] = int(np.count_nonzero(~np.isnan(self.values[column])))
+
+        # Industries nest within sectors, so ordering by (Sector, Industry) makes every
+        # group at either level one contiguous run.
+        self.group_levels = list(group_levels)
+        factorized = [pd.factorize(companies[level], sort=True) for level in self.group_levels]
+        codes = [code for code, _ in factorized]
+        self.group_codes = dict(zip(self.group_levels, codes))
+        self.group_names = {level: list(names) for level, (_, names) in zip(self.group_levels, factorized)}
+        self.group_order = np.lexsort(codes[::-1])
+        self.block = np.stack([self.values[column][self.group_order] for column in self.columns])
+        self.offsets = {}
+        for depth, level in enumerate(self.group_levels, start=1):
+            keys = np.stack([code[self.group_order] for code in codes[:depth]])
+            starts = np.flatnonzero(np.r_[True, (keys[:, 1:] != keys[:, :-1]).any(axis=0)])
+            stops = np.r_[starts[1:], len(companies)]
+            names = companies[level].to_numpy()[self.group_order[starts]]
+            self.offsets[level] = {name: (start, stop) for name, start, stop in zip(names, starts, stops)}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # -- queries returning row positions -------------------------------------------------
+
+    def range(self, column: str, low: float=None, high: float=None, inclusive: str='both') -> np.ndarray:
+        """Positions with low <= column <= high, ordered by column; `inclusive` as in pandas' between."""
+        values = self.sorted[column][:self.valid[column]]
+        start = 0 if low is None else np.searchsorted(values, low, 'left' if inclusive in ('both', 'left') else 'right')
+        stop = len(values) if high is None else np.searchsorted(values, high, 'right' if inclusive in ('both', 'right') else 'left')
+        return self.order[column][start:max(start, stop)]
+
+    def top(self, column: str, n: int=10, ascending: bool=False, positions: np.ndarray=None) -> np.ndarray:
+        if positions is None:
+            order = self.order[column] if ascending else self.descending[column]
+            return order[:min(n, self.valid[column])]
+        values = self.values[column][positions]
+        order = np.argsort(values if ascending else -values, kind='stable')
+        return positions[order[:min(n, np.count_nonzero(~np.isnan(values)))]]
+
+    def group(self, level: str, name) -> np.ndarray:
+        start, stop = self.offsets[level][name]
+        return self.group_order[start:stop]
+
+    def screen(self, ranges: dict=None, sector: str=None, industry: str=None) -> np.ndarray:
+        """Positions that satisfy every (low, high) range and group filter, in row order.
+
+        The most selective condition supplies the candidates; the others are checked on
+        those candidates only.
+        """
+        candidates = []
+        for column, (low, high) in (ranges or {}).items():
+            if column in self.order:
+                candidates.append(self.range(column, low, high))
+        for level, name in zip(self.group_levels, (sector, industry)):
+            if name is not None:
+                candidates.append(self.group(level, name) if name in self.offsets[level] else np.empty(0, dtype=np.intp))
+        positions = min(candidates, key=len) if candidates else np.arange(len(self))
+
+        mask = np.ones(len(positions), dtype=bool)
+        for column, (low, high) in (ranges or {}).items():
+            values = self.values[column][positions]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for level, name in zip(self.group_levels, (sector, industry)):
+            if name is not None:
+                code = self.group_names[level].index(name) if name in self.offsets[level] else -2
+                mask &= self.group_codes[level][positions] == code
+        return np.sort(positions[mask])
+
+    def take(self, positions: np.ndarray, columns: list=None) -> pd.DataFrame:
+        frame = self.frame if columns is None else self.frame[columns]
+        return frame.iloc[positions]
+
+    # -- statistics ----------------------------------------------------------------------
+
+    def _block(self, columns: list=None, level: str=None, name=None, positions: np.ndarray=None) -> np.ndarray:
+        rows = [self.columns.index(column) for column in columns] if columns is not None else slice(None)
+        if positions is not None:
+            return np.stack([self.values[column][positions] for column in (columns or self.columns)])
+        if level is not None:
+            start, stop = self.offsets[level][name]
+            return self.block[rows, start:stop]
+        return self.block[rows]
+
+    def corr(self, columns: list=None, level: str=None, name=None, positions: np.ndarray=None) -> pd.DataFrame:
+        columns = columns or self.columns
+        block = self._block(columns, level, name, positions)
+        if np.isnan(block).any():
+            return pd.DataFrame(block.T, columns=columns).corr()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame(np.corrcoef(block), index=columns, columns=columns)
+
+    def describe(self, column: str, level: str=None, name=None, positions: np.ndarray=None) -> pd.Series:
+        """The same statistics as Series.describe(), from the indexed arrays."""
+        values = self._block([column], level, name, positions)[0]
+        values = values[~np.isnan(values)]
+        count = len(values)
+        stats = [np.nan] * 7 if not count else [
+            values.mean(),
+            values.std(ddof=1) if count > 1 else np.nan,
+            *np.percentile(values, [0, 25, 50, 75, 100]),
+        ]
+        return pd.Series([float(count), *stats], index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                         name=column)
@@ -0,0 +1,92 @@
+# Typed columnar snapshots of the bundled CSVs.
+#
+# `python snapshot.py` converts both CSVs into Arrow IPC files: low-cardinality text
+# columns become dictionary (categorical) columns and `Date` a native timestamp. The
+# readers memory-map the snapshot and materialize only the requested columns. A snapshot
+# records the version of the CSV it was built from; when the CSV has moved on the
+# readers fall back to parsing the CSV with the same dtypes.
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from datafiles import CACHE_DIR, COMPANIES_CSV, INDEX_CSV, file_version
+from profiling import traced
+
+SNAPSHOT_DIR = CACHE_DIR / 'snapshots'
+COMPANIES_SNAPSHOT = SNAPSHOT_DIR / 'sp500_companies.arrow'
+INDEX_SNAPSHOT = SNAPSHOT_DIR / 'sp500_index.arrow'
+
+CATEGORICAL_COLUMNS = ['Sector', 'Industry', 'Exchange', 'State']
+_VERSION_KEY = b'source_version'
+
+
+def _read_companies_csv(columns=None) -> pd.DataFrame:
+    dtype = {column: 'category' for column in CATEGORICAL_COLUMNS}
+    companies = pd.read_csv(COMPANIES_CSV, usecols=columns, dtype=dtype)
+    return companies if columns is None else companies[columns]
+
+
+def _read_index_csv(columns=None) -> pd.DataFrame:
+    parse_dates = ['Date'] if columns is None or 'Date' in columns else False
+    index = pd.read_csv(INDEX_CSV, usecols=columns, parse_dates=parse_dates)
+    return index if columns is None else index[columns]
+
+
+def _write(df: pd.DataFrame, csv_path, snapshot_path) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _VERSION_KEY: file_version(csv_path).encode(),
+    })
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_suffix('.tmp')
+    # Uncompressed so the file can be memory-mapped without a decode step.
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    tmp_path.replace(snapshot_path)
+
+
+def build_snapshots() -> None:
+    _write(_read_companies_csv(), COMPANIES_CSV, COMPANIES_SNAPSHOT)
+    _write(_read_index_csv(), INDEX_CSV, INDEX_SNAPSHOT)
+
+
+def is_fresh(csv_path, snapshot_path) -> bool:
+    if not snapshot_path.exists():
+        return False
+    with pa.memory_map(str(snapshot_path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return metadata.get(_VERSION_KEY) == file_version(csv_path).encode()
+
+
+def _read_snapshot(snapshot_path, columns=None) -> pd.DataFrame:
+    table = feather.read_table(snapshot_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def companies_columns() -> list:
+    if is_fresh(COMPANIES_CSV, COMPANIES_SNAPSHOT):
+        with pa.memory_map(str(COMPANIES_SNAPSHOT)) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_csv(COMPANIES_CSV, nrows=0).columns.tolist()
+
+
+@traced()
+def read_companies(columns=None) -> pd.DataFrame:
+    columns = list(columns) if columns is not None else None
+    if is_fresh(COMPANIES_CSV, COMPANIES_SNAPSHOT):
+        return _read_snapshot(COMPANIES_SNAPSHOT, columns)
+    return _read_companies_csv(columns)
+
+
+@traced()
+def read_index(columns=None) -> pd.DataFrame:
+    columns = list(columns) if columns is not None else None
+    if is_fresh(INDEX_CSV, INDEX_SNAPSHOT):
+        return _read_snapshot(INDEX_SNAPSHOT, columns)
+    return _read_index_csv(columns)
+
+
+if __name__ == '__main__':
+    build_snapshots()
+    print(f'Snapshots written to {SNAPSHOT_DIR}')
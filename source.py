@@ -28,88 +28,206 @@
 # Importing necessary libraries
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import os
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import cross_val_score
-import yfinance as yf
+
+from profiling import lazy_module
+
+# Charting and modelling libraries are imported on first use, so a page that only
+# shows tables never loads them.
+plt = lazy_module('matplotlib.pyplot')
+sns = lazy_module('seaborn')
+px = lazy_module('plotly.express')
+go = lazy_module('plotly.graph_objects')
+plotly_subplots = lazy_module('plotly.subplots')
+
+from compact import TEXT_COLUMNS, compact
+from aggregates import envelope, group_summary, sector_order, top_constituents
+from datafiles import COMPANIES_CSV, INDEX_CSV, versioned_cache
+from downsample import POINT_BUDGET, downsample
+from figcache import CONSOLIDATE_TRACES, merge_traces
+from index_store import IndexStore
+from screen import Screener
+from snapshot import companies_columns, read_companies
+from trend import fit_trend
+
+# Every dataset and figure below is built by a factory on first request and memoized
+# until the CSV it is derived from changes, so importing this module is cheap and
+# each page only pays for the charts it shows.
 
 # +
-companies = pd.read_csv('sp500_companies.csv')
-index = pd.read_csv('sp500_index.csv')
+@versioned_cache(COMPANIES_CSV)
+def load_companies(columns: tuple=None) -> pd.DataFrame:
+    # The long free-text columns are only read when asked for, see company_text().
+    if columns is None:
+        columns = tuple(column for column in companies_columns() if column not in TEXT_COLUMNS)
+    return compact(read_companies(columns), text_columns=())
+
+
+@versioned_cache(COMPANIES_CSV)
+def company_text() -> pd.DataFrame:
+    return load_companies(('Symbol', *TEXT_COLUMNS)).set_index('Symbol')
+
+
+# New rows of the index file are ingested incrementally; history is never re-parsed.
+index_store = IndexStore()
 
-companies.tail(), companies.info()
 
-index.head(), index.info()
+@versioned_cache(INDEX_CSV)
+def load_index(columns: tuple=None) -> pd.DataFrame:
+    index_store.refresh()
+    return index_store.frame(columns)
+
 # -
 
 # # Data preparation
 #
 
-companies.isna().sum()
+# +
+@versioned_cache(COMPANIES_CSV)
+def prepared_companies() -> pd.DataFrame:
+    companies = load_companies().copy()
+    columns_to_fill = ['Ebitda', 'Revenuegrowth', 'Fulltimeemployees']
+    for column in columns_to_fill:
+        companies[column] = companies[column].fillna(companies[column].median())
+    companies.State = companies.State.fillna(companies.State.mode()[0])
+    return compact(companies, text_columns=())
+
+
+@versioned_cache(COMPANIES_CSV)
+def companies() -> pd.DataFrame:
+    # Shares the prepared columns rather than holding a second copy of them.
+    prepared = prepared_companies()
+    return pd.DataFrame({**prepared, 'Mc/EBITDA': prepared.Marketcap/prepared.Ebitda}, copy=False)
+
+
+@versioned_cache(INDEX_CSV)
+def index() -> pd.DataFrame:
+    # `Date` already arrives as a timestamp column from the index store.
+    return load_index()
+
+
+# Sorted and grouped indexes over the fundamentals; range filters, top-N and per-group
+# statistics are answered from these without rescanning the table.
+@versioned_cache(COMPANIES_CSV)
+def screener() -> Screener:
+    return Screener(companies())
+
+
+# Sort orders are kept as row permutations; sorted frames are only built for a chart.
+@versioned_cache(COMPANIES_CSV)
+def sort_order(by: str='Marketcap') -> np.ndarray:
+    values = prepared_companies()[by].reset_index(drop=True)
+    return values.sort_values(ascending=False).index.to_numpy()
+
+
+def companies_sorted(by: str='Marketcap') -> pd.DataFrame:
+    return prepared_companies().iloc[sort_order(by)]
+
+
+# Sector/industry totals, ranges and top constituents; the sector bar charts are drawn
+# from these instead of from one bar per company.
+@versioned_cache(COMPANIES_CSV)
+def sector_summary(value: str) -> pd.DataFrame:
+    return group_summary(prepared_companies(), value)
+
+
+def _sector_bar(value: str, title: str):
+    # Overlaid per-company bars only ever show each industry's highest and lowest member,
+    # so those are the bars drawn, in a single trace colored per industry.
+    summary = sector_summary(value)
+    rank = {sector: i for i, sector in enumerate(sector_order(summary))}
+    bars = envelope(summary, value)
+    bars = bars.iloc[bars.Sector.map(rank).astype(int).argsort(kind='stable')]
+    palette = px.colors.qualitative.Plotly
+    industries = {industry: palette[i % len(palette)] for i, industry in enumerate(summary.Industry)}
+    fig = go.Figure(go.Bar(
+        x=bars.Sector,
+        y=bars[value],
+        marker_color=bars.Industry.map(industries).tolist(),
+        customdata=bars[['Industry', 'Total', 'Count', 'Top']],
+        hovertemplate=('<b>%{customdata[0]}</b><br>' + value + '=%{y}<br>Industry total=%{customdata[1]}'
+                       '<br>Companies=%{customdata[2]}<br>Top: %{customdata[3]}<extra></extra>'),
+    ))
+    fig.update_layout(
+        title=title,
+        barmode='overlay',
+        xaxis={'title': 'Sector', 'categoryorder': 'array', 'categoryarray': list(rank)},
+        yaxis_title=value,
+        height=650)
+    return fig
 
-columns_to_fill = ['Ebitda', 'Revenuegrowth', 'Fulltimeemployees']
-for column in columns_to_fill:
-    companies[column] = companies[column].fillna(companies[column].median())
-companies.State = companies.State.fillna(companies.State.mode()[0])
-index.Date = pd.to_datetime(index.Date)
+# -
 
 # # Exploratory Analysis
 
-fig_index = px.line(index, x=index["Date"], y=index["S&P500"], title='S&P500 Index Value', height=400)
+@versioned_cache(INDEX_CSV, maxsize=32)
+def fig_index(start=None, end=None, max_points: int=POINT_BUDGET):
+    # Only the visible date range is plotted, downsampled to the point budget. The full
+    # range, which is what the page's slider starts at, comes from the plot series the
+    # index store keeps up to date as rows arrive.
+    load_index()
+    full_range = index_store.covers(start, end) and max_points <= index_store.max_points
+    source_ = index_store.plot_series() if full_range else index()
+    index_ = downsample(source_, 'S&P500', x='Date', max_points=max_points, x_range=(start, end))
+    return px.line(index_, x=index_["Date"], y=index_["S&P500"], title='S&P500 Index Value', height=400)
 
 
 # The Index Value has shown a consistent upward trend, except for a significant drop in 2020 caused by the COVID-19 pandemic.
 
-X=index['S&P500'].to_numpy().reshape(-1,1)
-y=index.Date
-model=LinearRegression()
-model.fit(X, y)
-
-model.score(X, y)
-
-cross_val_score(model, X, y, cv=5).mean()
-
-y_pred =model.predict(X)
-y_pred
-
-sns.scatterplot(data=index, x='S&P500', y='Date')
+# +
+@versioned_cache(INDEX_CSV)
+def index_regression():
+    # Index level against days since the first row. The fit comes from the sums the
+    # index store keeps up to date; the time-series folds are scored from prefix sums.
+    index_ = load_index()
+    model = fit_trend(index_.Date, index_['S&P500'], origin=index_store.origin(), stats=index_store.trend())
+    y_pred = model.predict(index_.Date)
+    return model, model.score, model.cv_scores.mean(), y_pred
+
+
+@versioned_cache(INDEX_CSV)
+def fig_index_regression():
+    index_ = index()
+    y_pred = index_regression()[3]
+    fig_regression, ax = plt.subplots()
+    sns.scatterplot(data=index_, x='Date', y='S&P500', ax=ax)
+    sns.lineplot(x=index_.Date, y=y_pred, color='red', ax=ax)
+    return fig_regression
 
-sns.lineplot(x=index['S&P500'], y=y_pred, color='red') 
 
 # +
-companies_sorted = companies.sort_values(by=["Marketcap"], ascending=False)
+@versioned_cache(COMPANIES_CSV)
+def fig_mcap_sector():
+    return _sector_bar('Marketcap', 'Market Capitalization By Sector')
 
-fig_mcap_sector = px.bar(
-    companies_sorted, 
-    x="Sector", 
-    y="Marketcap", 
-    barmode='overlay',
-    hover_data = 'Industry',
-    title='Market Capitalization By Sector',
-    color = 'Industry', 
-    height=650)
+
+@versioned_cache(COMPANIES_CSV, maxsize=64)
+def fig_sector_drilldown(sector: str, value: str='Marketcap', top_n: int=20):
+    return px.bar(
+        top_constituents(prepared_companies(), value, sector, top_n),
+        x='Symbol',
+        y=value,
+        hover_data=['Shortname', 'Industry'],
+        title=f'{sector} - Top {top_n} Companies by {value}',
+        color='Industry',
+        height=500)
 
 
 
 # +
-companies_sorted = companies.sort_values(by=['Marketcap'], ascending=False)
-
-fig_mcap_outliers = px.box(
-    companies_sorted, 
-    x='Sector', 
-    y='Marketcap', 
-    points='suspectedoutliers',
-    hover_data = ['Industry', 'Symbol'],
-    title='Market Capitalization By Sector - Outliers - Top Companies', 
-    height=650,
-    color='Sector')
-fig_mcap_outliers.update_layout(showlegend=False)
-fig_mcap_outliers.update_traces(marker={'size': 8})
+@versioned_cache(COMPANIES_CSV)
+def fig_mcap_outliers():
+    fig_mcap_outliers = px.box(
+        companies_sorted('Marketcap'),
+        x='Sector',
+        y='Marketcap',
+        points='suspectedoutliers',
+        hover_data = ['Industry', 'Symbol'],
+        title='Market Capitalization By Sector - Outliers - Top Companies',
+        height=650,
+        color='Sector')
+    fig_mcap_outliers.update_layout(showlegend=False)
+    fig_mcap_outliers.update_traces(marker={'size': 8})
+    return fig_mcap_outliers
 
 # -
 
@@ -131,17 +249,9 @@ fig_mcap_outliers.update_traces(marker={'size': 8})
 #
 
 # +
-companies_sorted = companies.sort_values(by=['Ebitda'], ascending=False)
-
-fig_Ebitda = px.bar(
-    companies_sorted, 
-    x="Sector", 
-    y="Ebitda", 
-    barmode='overlay',
-    hover_data = 'Industry',
-    title='EBITDA By Sector',
-    color = 'Industry', 
-    height=650)
+@versioned_cache(COMPANIES_CSV)
+def fig_Ebitda():
+    return _sector_bar('Ebitda', 'EBITDA By Sector')
 
 
 # -
@@ -157,17 +267,9 @@ fig_Ebitda = px.bar(
 # Overall, these discrepancies highlight the different ways investors value future growth versus current profitability, influencing sector performance and risk assessment.
 
 # +
-companies_sorted = companies.sort_values(by=['Revenuegrowth'], ascending=False)
-
-fig_Revenue = px.bar(
-    companies_sorted, 
-    x="Sector", 
-    y="Revenuegrowth", 
-    barmode='overlay',
-    hover_data = 'Industry',
-    title='Revenue Growth or Decline By Sector',
-    color = 'Industry', 
-    height=650)
+@versioned_cache(COMPANIES_CSV)
+def fig_Revenue():
+    return _sector_bar('Revenuegrowth', 'Revenue Growth or Decline By Sector')
 
 
 # -
@@ -178,80 +280,121 @@ fig_Revenue = px.bar(
 #
 # Consumer Cyclical Sector Revenue Growth at -14.8% indicates that the sector is currently experiencing a contraction. Despite it, Market Cap is ranked 2nd, which reflects investor confidence in the sector’s potential. 
 
-correlation_matrix = companies.corr(numeric_only=True)
-mask=np.triu(correlation_matrix).round(3)
-cor_fig = plt.figure(figsize=(10, 4))
-sns.heatmap(correlation_matrix, annot=True, cmap='icefire', linewidths=0.5, mask=mask)
-plt.title('Correlation Heatmap')
+# +
+@versioned_cache(COMPANIES_CSV)
+def correlation_matrix() -> pd.DataFrame:
+    columns = prepared_companies().select_dtypes('number').columns.tolist()
+    return screener().corr(columns)
+
+
+@versioned_cache(COMPANIES_CSV)
+def cor_fig():
+    correlation_matrix_ = correlation_matrix()
+    mask=np.triu(correlation_matrix_).round(3)
+    cor_fig, ax = plt.subplots(figsize=(10, 4))
+    sns.heatmap(correlation_matrix_, annot=True, cmap='icefire', linewidths=0.5, mask=mask, ax=ax)
+    ax.set_title('Correlation Heatmap')
+    return cor_fig
 
 
 # +
-fig_revenue_ebitda_cap = px.scatter(
-    companies_sorted, 
-    x='Ebitda', 
-    y='Revenuegrowth',
-    hover_data=['Industry', 'Symbol'],
-    size = 'Marketcap',
-    title='Revenue Growth vs EBITDA vs Market Capitalization',
-    color = 'Symbol', 
-    height=650)
+@versioned_cache(COMPANIES_CSV)
+def fig_revenue_ebitda_cap(consolidate: bool=CONSOLIDATE_TRACES):
+    fig = px.scatter(
+        companies_sorted('Revenuegrowth'),
+        x='Ebitda',
+        y='Revenuegrowth',
+        hover_data=['Industry', 'Symbol'],
+        size = 'Marketcap',
+        title='Revenue Growth vs EBITDA vs Market Capitalization',
+        color = 'Symbol',
+        height=650)
+    return merge_traces(fig) if consolidate else fig
 
 
 
 # +
-mega_cap = px.scatter(companies[companies.Marketcap > 2.00e+11],
-    x='Ebitda', 
-    y='Marketcap',
-    hover_data=['Industry', 'Symbol'],
-    color = 'Symbol',
-    height=850)
-large_cap = px.scatter(
-    companies[companies.Marketcap < 2.00e+11], 
-    x='Ebitda', 
-    y='Marketcap',
-    hover_data=['Industry', 'Symbol'],
-    color = 'Symbol',
-    height=850)
-
-fig = make_subplots(
-    rows=1, cols=2,
-    shared_xaxes=True,
-    vertical_spacing=0.02, subplot_titles=('Mega Cap Companies > $200B', 'Large Cap Companies < $200B')
-    )
-
-# add each trace (or traces) to its specific subplot
-for i in mega_cap.data :
-    fig.add_trace(i, row=1, col=1)
-
-for i in large_cap.data :
-    fig.add_trace(i, row=1, col=2)
-
-fig.update_layout(height=850, title_text='EBITDA vs Market Capitalization Comparison')
-fig.update_traces(marker={'size': 9})
-
-
-
-
-fig_hist_mega_cap, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
-sns.histplot(companies[companies.Marketcap > 2.00e+11].Marketcap, ax=ax1, color = '#6bb30c', bins=30, kde=True)
-ax1.set_title('Mega Cap - Market Capitalisation Distribution')
-ax1.set_xticks(np.arange(5, 31, 5))
-sns.histplot(companies[companies.Marketcap > 2.00e+11].Ebitda, color = '#81A9F1', ax=ax2, bins=30, kde=True)
-ax2.set_title('Mega Cap - EBITDA Distribution')
-
-fig_hist_large_cap, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
-sns.histplot(companies[companies.Marketcap < 2.00e+11].Marketcap, ax=ax1, color = '#6bb30c', bins=30, kde=True)
-ax1.set_title('Large Cap - Market Capitalisation Distribution')
-ax1.set_xticks(np.arange(5, 31, 5))
-sns.histplot(companies[companies.Marketcap < 2.00e+11].Ebitda, color = '#81A9F1', ax=ax2, bins=30, kde=True)
-ax2.set_title('Large Cap - EBITDA Distribution')
+MEGA_CAP = 2.00e+11
+
+
+def mega_cap() -> np.ndarray:
+    return np.sort(screener().range('Marketcap', low=MEGA_CAP, inclusive='right'))
+
+
+def large_cap() -> np.ndarray:
+    return np.sort(screener().range('Marketcap', high=MEGA_CAP, inclusive='left'))
+
+
+@versioned_cache(COMPANIES_CSV)
+def mega_cap_companies() -> pd.DataFrame:
+    return screener().take(mega_cap())
+
+
+@versioned_cache(COMPANIES_CSV)
+def large_cap_companies() -> pd.DataFrame:
+    return screener().take(large_cap())
+
+
+@versioned_cache(COMPANIES_CSV)
+def fig_mega_large_cap(consolidate: bool=CONSOLIDATE_TRACES):
+    mega_cap = px.scatter(mega_cap_companies(),
+        x='Ebitda',
+        y='Marketcap',
+        hover_data=['Industry', 'Symbol'],
+        color = 'Symbol',
+        height=850)
+    large_cap = px.scatter(
+        large_cap_companies(),
+        x='Ebitda',
+        y='Marketcap',
+        hover_data=['Industry', 'Symbol'],
+        color = 'Symbol',
+        height=850)
+
+    fig = plotly_subplots.make_subplots(
+        rows=1, cols=2,
+        shared_xaxes=True,
+        vertical_spacing=0.02, subplot_titles=('Mega Cap Companies > $200B', 'Large Cap Companies < $200B')
+        )
+
+    # add the traces of each chart to its subplot, in one call rather than one per trace
+    fig.add_traces(mega_cap.data + large_cap.data,
+                   rows=1, cols=[1] * len(mega_cap.data) + [2] * len(large_cap.data))
+
+    fig.update_layout(height=850, title_text='EBITDA vs Market Capitalization Comparison')
+    fig.update_traces(marker={'size': 9})
+    return merge_traces(fig) if consolidate else fig
+
+
+def _fig_hist_cap(companies_: pd.DataFrame, label: str):
+    fig_hist, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+    sns.histplot(companies_.Marketcap, ax=ax1, color = '#6bb30c', bins=30, kde=True)
+    ax1.set_title(f'{label} - Market Capitalisation Distribution')
+    ax1.set_xticks(np.arange(5, 31, 5))
+    sns.histplot(companies_.Ebitda, color = '#81A9F1', ax=ax2, bins=30, kde=True)
+    ax2.set_title(f'{label} - EBITDA Distribution')
+    return fig_hist
+
+
+@versioned_cache(COMPANIES_CSV)
+def fig_hist_mega_cap():
+    return _fig_hist_cap(mega_cap_companies(), 'Mega Cap')
+
+
+@versioned_cache(COMPANIES_CSV)
+def fig_hist_large_cap():
+    return _fig_hist_cap(large_cap_companies(), 'Large Cap')
 
 
 # +
-companies['Mc/EBITDA'] = companies.Marketcap/companies.Ebitda
+@versioned_cache(COMPANIES_CSV)
+def mega_cap_df() -> pd.Series:
+    return screener().describe('Mc/EBITDA', positions=mega_cap())
+
 
-mega_cap_df = companies['Mc/EBITDA'][companies.Marketcap > 2.00e+11].describe()
-large_cap_df = companies['Mc/EBITDA'][companies.Marketcap < 2.00e+11].describe()
+@versioned_cache(COMPANIES_CSV)
+def large_cap_df() -> pd.Series:
+    return screener().describe('Mc/EBITDA', positions=large_cap())
 
 # -
 
@@ -43,11 +43,34 @@
 # Importing necessary libraries
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-import yfinance as yf
+
+from profiling import lazy_module
+
+# Charting libraries are imported on first use; yfinance only when bars are fetched.
+plt = lazy_module('matplotlib.pyplot')
+sns = lazy_module('seaborn')
+go = lazy_module('plotly.graph_objects')
+
+import indicators
+import returnstats
+from barstore import BarStore, yahoo_history
+from datafiles import keyed_cache
+from downsample import POINT_BUDGET, downsample, downsample_ohlc
+from imgcache import ImageCache
+from live import CAPACITY, LiveBars
+from resample import INTERVALS, can_derive, normalize, resample_ohlcv
+
+# Bars are served from the local store under the cache directory; only the missing
+# head or tail of a request goes to the network. Pass `store=None` to bypass it, or a
+# different `fetch` function to run against another provider.
+#
+# `interval` is the finest resolution the stock is fetched at; bars(interval) derives
+# any coarser one (1h, 1d, 1wk, 1mo, ...) from those bars locally and keeps it, so
+# switching between resolutions does no further I/O.
+#
+# follow(feed) streams new bars into a fixed-size live window (see live.py) whose
+# indicators are updated per bar instead of over the whole history.
+default_store = BarStore()
 
 
 class Stock:
@@ -58,7 +81,9 @@ class Stock:
         period: str='1y',
         interval: str='1d',
         start: str=None,
-        end: str=None
+        end: str=None,
+        fetch=yahoo_history,
+        store: BarStore=default_store,
     ) -> None:
         
         self.ticker = ticker
@@ -66,12 +91,88 @@ class Stock:
         self.interval = interval
         self.start = start
         self.end = end
-        self.df = yf.Ticker(self.ticker).history(
-            period=self.period,
-            interval=self.interval,
-            start=self.start,
-            end=self.end,
-        ).drop(['Dividends', 'Stock Splits'], axis=1)
+        if store is None:
+            self.df = fetch(
+                self.ticker,
+                self.interval,
+                start=self.start,
+                end=self.end,
+                period=None if self.start else self.period,
+            )
+        else:
+            self.df = store.history(
+                self.ticker,
+                interval=self.interval,
+                period=self.period,
+                start=self.start,
+                end=self.end,
+                fetch=fetch,
+            )
+        self._bars = {normalize(self.interval): self.df}
+        self._live = None
+
+    def bars(self, interval: str=None) -> pd.DataFrame:
+        interval = normalize(interval or self.interval)
+        if interval not in self._bars:
+            # Aggregate from the coarsest bars already at hand that nest into the target.
+            sources = [fetched for fetched in self._bars if can_derive(fetched, interval)]
+            if not sources:
+                raise ValueError(f'{interval} bars cannot be derived from {self.interval} bars')
+            self._bars[interval] = resample_ohlcv(self._bars[max(sources, key=INTERVALS.index)], interval)
+        return self._bars[interval]
+
+    def live(self, specs=None, capacity: int=CAPACITY) -> LiveBars:
+        """The live window, seeded from the fetched bars on first use."""
+        if self._live is None:
+            self._live = LiveBars(self.df, INDICATORS if specs is None else specs, capacity)
+        return self._live
+
+    def follow(self, feed, limit: int=None):
+        """Apply bars from `feed` to the live window, yielding each updated row."""
+        return self.live().consume(feed, limit)
+
+
+# Each chart below is built by a factory on first request and memoized per ticker for
+# one `max_age` window of the bar store: in the next window the stock is loaded again,
+# so the store fetches the bars since its last one, and the charts follow.
+def bars_window() -> int:
+    return pd.Timestamp.now(tz='UTC').value // default_store.max_age.value
+
+
+@keyed_cache(bars_window)
+def stock(ticker: str='NFLX') -> Stock:
+    return Stock(ticker)
+
+
+def history(ticker: str='NFLX', interval: str='1d') -> pd.DataFrame:
+    return stock(ticker).bars(interval)
+
+
+# 10-day, 20-day and 50-day SMA and EMA plus the daily return, computed once per ticker
+# by the indicator engine and shared by every chart below.
+INDICATORS = ['SMA_10', 'SMA_20', 'SMA_50', 'EMA_10', 'EMA_20', 'EMA_50', 'RET_1']
+
+
+@keyed_cache(bars_window)
+def with_indicators(ticker: str='NFLX', interval: str='1d') -> pd.DataFrame:
+    df = history(ticker, interval)
+    computed = indicators.for_series(df['Close'], INDICATORS).rename(columns={'RET_1': 'Daily_Return'})
+    return df.join(computed)
+
+
+# The Matplotlib charts rasterized once per ticker and latest bar, e.g.
+# png(fig_return, 'NFLX'); the bytes are shared through the on-disk image cache.
+images = ImageCache()
+
+
+def png_key(figure, ticker: str='NFLX', max_points: int=POINT_BUDGET) -> str:
+    return images.key(figure.__name__, [history(ticker).index[-1].isoformat()], (ticker, max_points))
+
+
+def png(figure, ticker: str='NFLX', max_points: int=POINT_BUDGET) -> bytes:
+    key = png_key(figure, ticker, max_points)
+    data = images.get(key)
+    return data if data is not None else images.submit(key, figure, ticker, max_points).result()
 
 
 
@@ -83,37 +184,42 @@ class Stock:
 # Volume is a fundamental metric in trading, especially when used in conjunction with price analysis. For instance, a price increase along with high volume often signifies strong buying interest, while a price increase with low volume may signal a lack of conviction and may not be sustainable.
 
 # +
-NFLX = Stock('NFLX').df
+@keyed_cache(bars_window)
+def fig_price_volume_change(ticker: str='NFLX', max_points: int=POINT_BUDGET):
+    df = with_indicators(ticker)
+    # Line charts are drawn from at most `max_points` points; spikes in the change are kept
+    close_df = downsample(df, 'Close', max_points=max_points)
 
-fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(14, 15))
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(14, 15))
 
-# Plot the closing price
-sns.lineplot(data=NFLX, ax=ax1, x=NFLX.index, y='Close', color='green')
-ax1.set_title('NFLX Closing Price')
+    # Plot the closing price
+    sns.lineplot(data=close_df, ax=ax1, x=close_df.index, y='Close', color='green')
+    ax1.set_title(f'{ticker} Closing Price')
 
-# Plot the volume
-sns.barplot(data=NFLX, ax=ax2, x=NFLX.index, y='Volume', color='orange')
-ax2.set_title('NFLX Trading Volume')
+    # Plot the volume; beyond `max_points` bars, consecutive bars are merged and their volume summed
+    volume_df = downsample_ohlc(df[['Volume']], max_points=max_points)
+    width = (volume_df.index.to_series().diff().median() / pd.Timedelta(days=1)) if len(volume_df) > 1 else 1.0
+    ax2.bar(volume_df.index, volume_df['Volume'], width=width, align='edge', color='orange')
+    ax2.set_ylabel('Volume')
+    ax2.set_title(f'{ticker} Trading Volume')
 
-# Plot the daily percentage change
-NFLX_change = NFLX['Close'].pct_change()
-NFLX_change_df = pd.DataFrame({'Change': NFLX_change})  # Create a DataFrame with the change as a column
-sns.lineplot(data=NFLX_change_df, ax=ax3, x=NFLX_change_df.index, y='Change', color='green')
-ax3.axhline(0, color='#fa6f6f', linestyle='--') 
-ax3.set_title('NFLX Daily Change')
+    # Plot the daily percentage change
+    change_df = pd.DataFrame({'Change': df['Daily_Return']})  # Create a DataFrame with the change as a column
+    change_df = downsample(change_df, 'Change', max_points=max_points, method='minmax')
+    sns.lineplot(data=change_df, ax=ax3, x=change_df.index, y='Change', color='green')
+    ax3.axhline(0, color='#fa6f6f', linestyle='--') 
+    ax3.set_title(f'{ticker} Daily Change')
 
-plt.tight_layout()
+    fig.tight_layout()
+    return fig
 
 
 # +
-NFLX_change = NFLX['Close'].pct_change() + 1  # Add 1 to each change to adjust
+@keyed_cache(bars_window)
+def geo_mean_change(ticker: str='NFLX') -> float:
+    # Geometric mean of the daily percentage changes; the first NaN value is skipped
+    return returnstats.geometric_mean(with_indicators(ticker)['Daily_Return'])
 
-def geo_mean(arr):
-    return np.prod(arr)**(1/len(arr))
-
-# Call function on the percentage changes, excluding the first NaN value
-geo_mean_NFLX = geo_mean(NFLX_change.dropna())-1
-print(f"Geometric mean of daily percentage change (average daily percentage change over the period): {geo_mean_NFLX* 100:.4f}%")
 # -
 
 # # 2. Moving average
@@ -121,36 +227,32 @@ print(f"Geometric mean of daily percentage change (average daily percentage chan
 # The moving average (MA) is a simple technical analysis tool that smooths out price data by creating a constantly updated average price. The average is taken over a specific period of time, like 10 days, 20 minutes, 30 weeks, or any time period the trader chooses.
 
 # +
-# Calculate Simple Moving Average (SMA) for 10 days, 20 days, and 50 days
-NFLX['SMA_10'] = NFLX['Close'].rolling(window=10).mean()
-NFLX['SMA_20'] = NFLX['Close'].rolling(window=20).mean()
-NFLX['SMA_50'] = NFLX['Close'].rolling(window=50).mean()
-
-# Calculate Exponential Moving Average (EMA) for 10 days, 20 days, and 50 days
-NFLX['EMA_10'] = NFLX['Close'].ewm(span=10, adjust=False).mean()
-NFLX['EMA_20'] = NFLX['Close'].ewm(span=20, adjust=False).mean()
-NFLX['EMA_50'] = NFLX['Close'].ewm(span=50, adjust=False).mean()
+@keyed_cache(bars_window)
+def fig_moving_averages(ticker: str='NFLX', max_points: int=POINT_BUDGET):
+    # Simple and Exponential Moving Averages (SMA, EMA) for 10 days, 20 days, and 50 days
+    df = downsample(with_indicators(ticker), 'Close', max_points=max_points)
 
-# Plotting the Close price, SMA, and EMA
-ma = plt.figure(figsize=(14, 7))
+    # Plotting the Close price, SMA, and EMA
+    ma, ax = plt.subplots(figsize=(14, 7))
 
-# Plotting the closing prices
-sns.lineplot(data=NFLX, x=NFLX.index, y='Close', label='Close Price', color='blue')
+    # Plotting the closing prices
+    sns.lineplot(data=df, x=df.index, y='Close', label='Close Price', color='blue', ax=ax)
 
-# Plotting the Simple Moving Averages (SMA)
-sns.lineplot(data=NFLX, x=NFLX.index, y='SMA_10', label='10-Day SMA', color='green')
-sns.lineplot(data=NFLX, x=NFLX.index, y='SMA_20', label='20-Day SMA', color='orange')
-sns.lineplot(data=NFLX, x=NFLX.index, y='SMA_50', label='50-Day SMA', color='red')
+    # Plotting the Simple Moving Averages (SMA)
+    sns.lineplot(data=df, x=df.index, y='SMA_10', label='10-Day SMA', color='green', ax=ax)
+    sns.lineplot(data=df, x=df.index, y='SMA_20', label='20-Day SMA', color='orange', ax=ax)
+    sns.lineplot(data=df, x=df.index, y='SMA_50', label='50-Day SMA', color='red', ax=ax)
 
-# Plotting the Exponential Moving Averages (EMA)
-sns.lineplot(data=NFLX, x=NFLX.index, y='EMA_10', label='10-Day EMA', color='purple')
-sns.lineplot(data=NFLX, x=NFLX.index, y='EMA_20', label='20-Day EMA', color='brown')
-sns.lineplot(data=NFLX, x=NFLX.index, y='EMA_50', label='50-Day EMA', color='pink')
+    # Plotting the Exponential Moving Averages (EMA)
+    sns.lineplot(data=df, x=df.index, y='EMA_10', label='10-Day EMA', color='purple', ax=ax)
+    sns.lineplot(data=df, x=df.index, y='EMA_20', label='20-Day EMA', color='brown', ax=ax)
+    sns.lineplot(data=df, x=df.index, y='EMA_50', label='50-Day EMA', color='pink', ax=ax)
 
-plt.title('NFLX Stock Price with 10-Day, 20-Day, and 50-Day SMA and EMA')
-plt.xlabel('Date')
-plt.ylabel('Price')
-plt.legend()
+    ax.set_title(f'{ticker} Stock Price with 10-Day, 20-Day, and 50-Day SMA and EMA')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Price')
+    ax.legend()
+    return ma
 
 
 # -
@@ -160,25 +262,29 @@ plt.legend()
 # Now that we've done some baseline analysis, let's go ahead and dive a little deeper. We're now going to analyze the risk of the stock. In order to do so we'll need to take a closer look at the daily changes of the stock, and not just its absolute value. Let's go ahead and use pandas to retrieve teh daily returns for the Apple stock.
 
 # +
-# Calculate daily returns as percentage change of 'Close' prices
-NFLX['Daily_Return'] = NFLX['Close'].pct_change()
-
-# Plotting the histograms for daily returns
-fig_return, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
-
-# Line plot of daily returns
-sns.lineplot(data=NFLX, x=NFLX.index, y='Daily_Return', ax=ax1, color='blue', linestyle=':', marker='o')
-ax1.set_title('Daily Returns Line Plot')
-ax1.set_xlabel('Date')
-ax1.set_ylabel('Daily Return')
-
-# Histogram of daily returns with a Kernel Density Estimate (KDE) overlay
-sns.histplot(NFLX['Daily_Return'], kde=True, ax=ax2, bins=50, color='green')
-ax2.set_title('Histogram of Daily Returns with KDE')
-ax2.set_xlabel('Daily Return')
-ax2.set_ylabel('Density')
-
-plt.tight_layout()
+@keyed_cache(bars_window)
+def fig_return(ticker: str='NFLX', max_points: int=POINT_BUDGET):
+    # Daily returns as percentage change of 'Close' prices
+    df = with_indicators(ticker)
+
+    # Plotting the histograms for daily returns
+    fig_return, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+
+    # Line plot of daily returns
+    line_df = downsample(df, 'Daily_Return', max_points=max_points, method='minmax')
+    sns.lineplot(data=line_df, x=line_df.index, y='Daily_Return', ax=ax1, color='blue', linestyle=':', marker='o')
+    ax1.set_title('Daily Returns Line Plot')
+    ax1.set_xlabel('Date')
+    ax1.set_ylabel('Daily Return')
+
+    # Histogram of daily returns with a Kernel Density Estimate (KDE) overlay
+    sns.histplot(df['Daily_Return'], kde=True, ax=ax2, bins=50, color='green')
+    ax2.set_title('Histogram of Daily Returns with KDE')
+    ax2.set_xlabel('Daily Return')
+    ax2.set_ylabel('Density')
+
+    fig_return.tight_layout()
+    return fig_return
 
 # -
 
@@ -187,55 +293,95 @@ plt.tight_layout()
 # A candlestick chart is a type of financial chart used to represent the price movement of an asset over a specific time period. It’s widely used in technical analysis to help visualize the open, high, low, and close prices (OHLC) for a particular time frame (e.g., daily, hourly).
 
 # +
-# Calculate the 10-day and 50-day Exponential Moving Averages (EMA)
-NFLX['EMA10'] = NFLX['Close'].ewm(span=10, adjust=False).mean()
-NFLX['EMA50'] = NFLX['Close'].ewm(span=50, adjust=False).mean()
-
-# Create the Candlestick chart with EMAs
-fig_candlestick = go.Figure()
-
-# Add the Candlestick chart
-fig_candlestick.add_trace(go.Candlestick(
-    x=NFLX.index,            
-    open=NFLX['Open'],     
-    high=NFLX['High'],        
-    low=NFLX['Low'],         
-    close=NFLX['Close'],      
-    increasing_line_color='green',  
-    decreasing_line_color='red',    
-))
-
-# Add the 10-day EMA
-fig_candlestick.add_trace(go.Scatter(
-    x=NFLX.index,
-    y=NFLX['EMA10'],
-    mode='lines',
-    name='10-day EMA',
-    line=dict(color='blue', width=2)  
-))
-
-# Add the 50-day EMA
-fig_candlestick.add_trace(go.Scatter(
-    x=NFLX.index,
-    y=NFLX['EMA50'],
-    mode='lines',
-    name='50-day EMA',
-    line=dict(color='orange', width=2) 
-))
-
-fig_candlestick.update_layout(
-    title='Netflix Stock Candlestick Chart with 10-day and 50-day EMAs',
-    xaxis_title='Date',
-    yaxis_title='Price',
-    xaxis_rangeslider_visible=False,  # Optional: Hide the range slider for a cleaner look
-    legend=dict(x=0.01, y=0.99),      # Optional: Position the legend
-    height=650                       # Set the height of the chart to 650 pixels
-)
+@keyed_cache(bars_window)
+def fig_candlestick(ticker: str='NFLX', start=None, end=None, max_points: int=POINT_BUDGET, interval: str='1d'):
+    # The 10-day and 50-day Exponential Moving Averages (EMA); bars in the visible range
+    # are merged into wider candles when there are more than `max_points` of them.
+    # With a coarser `interval` the candles are weekly or monthly and the EMAs span bars.
+    unit = {'1d': 'day', '1wk': 'week', '1mo': 'month'}.get(normalize(interval), 'bar')
+    df = downsample_ohlc(with_indicators(ticker, interval), max_points=max_points, x_range=(start, end))
+
+    # Create the Candlestick chart with EMAs
+    fig_candlestick = go.Figure()
+
+    # Add the Candlestick chart
+    fig_candlestick.add_trace(go.Candlestick(
+        x=df.index,            
+        open=df['Open'],     
+        high=df['High'],        
+        low=df['Low'],         
+        close=df['Close'],      
+        increasing_line_color='green',  
+        decreasing_line_color='red',    
+    ))
+
+    # Add the 10-day EMA
+    fig_candlestick.add_trace(go.Scatter(
+        x=df.index,
+        y=df['EMA_10'],
+        mode='lines',
+        name=f'10-{unit} EMA',
+        line=dict(color='blue', width=2)  
+    ))
+
+    # Add the 50-day EMA
+    fig_candlestick.add_trace(go.Scatter(
+        x=df.index,
+        y=df['EMA_50'],
+        mode='lines',
+        name=f'50-{unit} EMA',
+        line=dict(color='orange', width=2) 
+    ))
+
+    fig_candlestick.update_layout(
+        title=f'{ticker} Stock Candlestick Chart with 10-{unit} and 50-{unit} EMAs',
+        xaxis_title='Date',
+        yaxis_title='Price',
+        xaxis_rangeslider_visible=False,  # Optional: Hide the range slider for a cleaner look
+        legend=dict(x=0.01, y=0.99),      # Optional: Position the legend
+        height=650                       # Set the height of the chart to 650 pixels
+    )
+    return fig_candlestick
 
 # Show the plot
 
 # -
 
+# # 6. Live bars
+#
+# For intraday monitoring, a stock can follow a feed of new bars, e.g.
+# `stock.follow(live.polling_feed(yahoo_history, 'NFLX', '1m'))`, or `live.simulated_feed()` offline. Each bar updates the moving averages and the return in constant time, and the chart is drawn from the live window only.
+
+# +
+def fig_live_candlestick(stock: Stock):
+    df = stock.live().frame()
+
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(
+        x=df.index,
+        open=df['Open'],
+        high=df['High'],
+        low=df['Low'],
+        close=df['Close'],
+        increasing_line_color='green',
+        decreasing_line_color='red',
+    ))
+    for column, color in (('EMA_10', 'blue'), ('EMA_50', 'orange')):
+        if column in df:
+            fig.add_trace(go.Scatter(x=df.index, y=df[column], mode='lines', name=column.replace('_', ' '),
+                                     line=dict(color=color, width=2)))
+    fig.update_layout(
+        title=f'{stock.ticker} Live Bars',
+        xaxis_title='Date',
+        yaxis_title='Price',
+        xaxis_rangeslider_visible=False,
+        legend=dict(x=0.01, y=0.99),
+        height=650
+    )
+    return fig
+
+# -
+
 # # Takeaway:
 #
 # This notebook provides a comprehensive analysis of stock performance, combining retrieved data, moving averages, daily returns, and candlestick charts to assess trends and risk.
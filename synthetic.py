@@ -0,0 +1,70 @@
+# Synthetic datasets from a fixed seed, for benchmarks and offline runs.
+#
+# synthetic_companies() resamples the bundled companies table with perturbed
+# fundamentals, synthetic_index() and synthetic_prices() are random walks over business
+# days ending 2024-12-20, and synthetic_fetch() serves OHLCV bars in the shape of
+# barstore.yahoo_history, so a Stock can run without the network. benchmark.py builds
+# its data from these, and the command-line tools' --synthetic options use them too.
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HERE = Path(__file__).resolve().parent
+SEED = 0
+YEARS = 20
+TRADING_DAYS = 252
+
+
+def synthetic_companies(n: int, seed: int=SEED) -> pd.DataFrame:
+    """n companies resampled from the bundled table, with perturbed fundamentals."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(HERE / 'sp500_companies.csv')
+    companies = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+    companies['Symbol'] = [f'{symbol}{i}' for i, symbol in enumerate(companies.Symbol)]
+    for column in ['Currentprice', 'Marketcap', 'Ebitda', 'Fulltimeemployees']:
+        companies[column] = companies[column] * rng.lognormal(0, 0.3, n)
+    companies['Marketcap'] = companies.Marketcap.round().astype('int64')
+    companies['Revenuegrowth'] = companies.Revenuegrowth + rng.normal(0, 0.05, n)
+    companies['Fulltimeemployees'] = companies.Fulltimeemployees.round()
+    companies = companies.sort_values('Marketcap', ascending=False, ignore_index=True)
+    companies['Weight'] = companies.Marketcap / companies.Marketcap.sum()
+    return companies
+
+
+def synthetic_index(years: int=YEARS, seed: int=SEED) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-20', periods=years * TRADING_DAYS)
+    level = 2000 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, len(dates))))
+    return pd.DataFrame({'Date': dates, 'S&P500': level.round(2)})
+
+
+def synthetic_prices(n_tickers: int, years: int=YEARS, seed: int=SEED) -> pd.DataFrame:
+    """Close prices, dates x tickers; some tickers start trading part-way through."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-20', periods=years * TRADING_DAYS)
+    returns = rng.normal(0.0003, 0.02, (len(dates), n_tickers))
+    prices = 50 * np.exp(np.cumsum(returns, axis=0))
+    listed = rng.integers(0, len(dates) // 4, n_tickers) * (rng.random(n_tickers) < 0.2)
+    prices[np.arange(len(dates))[:, None] < listed] = np.nan
+    return pd.DataFrame(prices, index=dates, columns=[f'T{i:04d}' for i in range(n_tickers)])
+
+
+def synthetic_fetch(years: int=YEARS, seed: int=SEED):
+    """A `fetch` function for stocks.Stock that serves one synthetic OHLCV history."""
+    close = synthetic_prices(1, years, seed).iloc[:, 0]
+    close.index = close.index.tz_localize('America/New_York').rename('Date')
+    rng = np.random.default_rng(seed)
+    bars = pd.DataFrame({
+        'Open': close.shift(fill_value=close.iloc[0]),
+        'High': close * (1 + rng.random(len(close)) * 0.02),
+        'Low': close * (1 - rng.random(len(close)) * 0.02),
+        'Close': close,
+        'Volume': rng.integers(1e5, 1e7, len(close)),
+    })
+
+    def fetch(ticker, interval, start=None, end=None, period=None):
+        return bars.copy()
+
+    return fetch
@@ -0,0 +1,167 @@
+# Server-side table views: only one page of the visible columns reaches the browser.
+#
+# st.dataframe serializes the whole frame to Arrow on every rerun and sends it to the
+# session, so the payload grows with the table: every row, every column, every long
+# text field. A TableView keeps the table in the worker and answers queries instead: a
+# search over its text columns, a value filter per column, a sort and a page. query()
+# returns the page's rows and the requested columns only, so what a session receives is
+# page_size x columns, whatever the size of the table. Sort keys and their orders are
+# computed on first use and kept, as in screen.Screener; a sorted page is a slice of a
+# permutation, filtered by a boolean mask. Long text fields are not part of the view:
+# `details` maps a row's key to them, and is called only for the row a reader selects.
+# show() draws the controls, the page and the selected row's details with Streamlit.
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import traced
+
+PAGE_SIZE = 25
+
+
+class Page(NamedTuple):
+    rows: pd.DataFrame
+    positions: np.ndarray
+    total: int
+    page: int
+    pages: int
+
+
+class TableView:
+
+    def __init__(self, frame: pd.DataFrame, key: str=None, details=None, search_columns=None) -> None:
+        self.frame = frame
+        self.columns = frame.columns.tolist()
+        self.key = key
+        self.details = details
+        if search_columns is None:
+            search_columns = [column for column in self.columns
+                              if frame[column].dtype == object or isinstance(frame[column].dtype, pd.CategoricalDtype)]
+        self.search_columns = list(search_columns)
+        self._keys = {}
+        self._orders = {}
+        self._lower = {}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _sort_key(self, column: str) -> np.ndarray:
+        # A float per row that sorts like the column, NaN for missing values.
+        if column not in self._keys:
+            values = self.frame[column]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                key = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif pd.api.types.is_datetime64_any_dtype(values):
+                key = np.where(values.isna(), np.nan, values.to_numpy().view(np.int64).astype(np.float64))
+            else:
+                codes, _ = pd.factorize(values.astype(str).where(values.notna()), sort=True)
+                key = np.where(codes < 0, np.nan, codes.astype(np.float64))
+            self._keys[column] = key
+        return self._keys[column]
+
+    def order(self, column: str, ascending: bool=True) -> np.ndarray:
+        """Row positions sorted by `column`, missing values last and ties in row order."""
+        if (column, ascending) not in self._orders:
+            key = self._sort_key(column)
+            self._orders[column, ascending] = np.argsort(key if ascending else -key, kind='stable')
+        return self._orders[column, ascending]
+
+    def _lowered(self, column: str) -> pd.Series:
+        if column not in self._lower:
+            self._lower[column] = self.frame[column].astype(str).where(self.frame[column].notna(), '').str.lower()
+        return self._lower[column]
+
+    def mask(self, search: str='', where: dict=None) -> np.ndarray:
+        """Rows containing `search` in any text column and whose columns take one of the `where` values."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, allowed in (where or {}).items():
+            if allowed is None or (not isinstance(allowed, str) and not len(allowed)):
+                continue
+            allowed = [allowed] if isinstance(allowed, str) or np.ndim(allowed) == 0 else list(allowed)
+            mask &= self.frame[column].isin(allowed).to_numpy()
+        search = search.strip().lower()
+        if search:
+            found = np.zeros(len(self), dtype=bool)
+            for column in self.search_columns:
+                found |= self._lowered(column).str.contains(search, regex=False).to_numpy()
+            mask &= found
+        return mask
+
+    def choices(self, column: str) -> list:
+        return sorted(self.frame[column].dropna().unique().tolist())
+
+    @traced('table query')
+    def query(self, columns: list=None, sort: str=None, ascending: bool=True, search: str='', where: dict=None,
+              page: int=1, page_size: int=PAGE_SIZE) -> Page:
+        """One page of the matching rows, sorted, with only `columns`; pages count from 1."""
+        mask = self.mask(search, where)
+        if sort is not None:
+            order = self.order(sort, ascending)
+            positions = order[mask[order]]
+        else:
+            positions = np.flatnonzero(mask)
+        total = len(positions)
+        pages = max(1, -(-total // page_size))
+        page = min(max(1, page), pages)
+        positions = positions[(page - 1) * page_size:page * page_size]
+        columns = self.columns if columns is None else [column for column in self.columns if column in columns]
+        rows = self.frame.iloc[positions, [self.columns.index(column) for column in columns]]
+        return Page(rows, positions, total, page, pages)
+
+    def detail(self, position: int):
+        """The long fields of the row at `position`, from `details`."""
+        if self.details is None:
+            return None
+        return self.details(self.frame[self.key].iat[position] if self.key is not None else position)
+
+
+def show(view: TableView, key: str, columns: list=None, filters=(), page_size: int=PAGE_SIZE, dg=None):
+    """Controls, one page of `view` and the details of the selected row; returns the Page."""
+    import streamlit as st
+
+    dg = dg if dg is not None else st
+    state = st.session_state
+    col1, col2, col3 = dg.columns([3, 2, 1], vertical_alignment='bottom')
+    shown = col1.multiselect('Columns', view.columns, default=columns or view.columns, key=f'{key}_columns')
+    sort = col2.selectbox('Sort by', [None, *view.columns], format_func=lambda column: column or 'Row order',
+                          key=f'{key}_sort')
+    descending = col3.toggle('Descending', key=f'{key}_descending')
+
+    where = {}
+    search = ''
+    if filters or view.search_columns:
+        controls = dg.columns(len(filters) + 1)
+        for control, column in zip(controls, filters):
+            where[column] = control.multiselect(column, view.choices(column), key=f'{key}_{column}')
+        if view.search_columns:
+            search = controls[-1].text_input('Search', key=f'{key}_search')
+
+    page = view.query(shown, sort, not descending, search, where, state.get(f'{key}_page', 1), page_size)
+    # Out of range after a narrower filter: back to the last page before the widget is drawn.
+    if state.get(f'{key}_page', 1) != page.page:
+        state[f'{key}_page'] = page.page
+
+    # Keyed on the query, so a selection does not carry over to another page's rows.
+    signature = hash((tuple(shown), sort, descending, search, tuple((k, tuple(v)) for k, v in where.items()), page.page))
+    selectable = view.details is not None
+    event = dg.dataframe(page.rows, hide_index=True, use_container_width=True, key=f'{key}_rows_{signature}',
+                         on_select='rerun' if selectable else 'ignore', selection_mode='single-row')
+
+    col1, col2 = dg.columns([4, 1], vertical_alignment='center')
+    col1.caption(f'{page.total} of {len(view)} rows, page {page.page} of {page.pages}'
+                 + (' - select a row for its details' if selectable else ''))
+    col2.number_input('Page', min_value=1, max_value=page.pages, step=1, key=f'{key}_page',
+                      label_visibility='collapsed')
+
+    selected = event.selection.rows if selectable else []
+    if selected:
+        detail = view.detail(int(page.positions[selected[0]]))
+        if detail is not None:
+            box = dg.container(border=True)
+            for name, text in (detail.items() if hasattr(detail, 'items') else [('', detail)]):
+                if name:
+                    box.markdown(f'**{name}**')
+                box.write(text if pd.notna(text) else '')
+    return page
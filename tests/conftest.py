@@ -0,0 +1,79 @@
+# The modules live at the repository root; make them importable from the tests.
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TZ = 'America/New_York'
+
+
+def _bars(days: int=500, seed: int=0) -> pd.DataFrame:
+    # Random-walk daily OHLCV bars, indexed like Yahoo's and ending on 2024-12-20.
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2024-12-20', periods=days, tz=TZ, name='Date')
+    close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, days))), index=index)
+    return pd.DataFrame({
+        'Open': close.shift(fill_value=close.iloc[0]),
+        'High': close * (1 + rng.random(days) * 0.02),
+        'Low': close * (1 - rng.random(days) * 0.02),
+        'Close': close,
+        'Volume': rng.integers(1e5, 1e7, days),
+    })
+
+
+class FakeProvider:
+    """A `fetch` function serving the same bars for every ticker, up to `available`.
+
+    Tickers in `failing` always raise, those in `flaky` raise once and those in `empty`
+    get no bars. Every request is recorded in `calls`.
+    """
+
+    def __init__(self, bars: pd.DataFrame, available=None, failing=(), flaky=(), empty=()) -> None:
+        self.bars = bars
+        self.available = available
+        self.failing = set(failing)
+        self.flaky = set(flaky)
+        self.empty = set(empty)
+        self.calls = []
+
+    def count(self, ticker: str) -> int:
+        return sum(call['ticker'] == ticker for call in self.calls)
+
+    def __call__(self, ticker, interval, start=None, end=None, period=None):
+        self.calls.append({'ticker': ticker, 'start': start, 'end': end, 'period': period})
+        if ticker in self.failing:
+            raise ConnectionError(f'{ticker} unavailable')
+        if ticker in self.flaky:
+            self.flaky.discard(ticker)
+            raise ConnectionError(f'{ticker} timed out')
+        served = self.bars
+        if ticker in self.empty:
+            return served.iloc[:0]
+        if self.available is not None:
+            served = served[served.index < _at(self.available)]
+        if start is not None:
+            served = served[served.index >= _at(start)]
+        if end is not None:
+            served = served[served.index < _at(end)]
+        return served.copy()
+
+
+def _at(value) -> pd.Timestamp:
+    # Naive dates are exchange dates, as Yahoo reads them.
+    value = pd.Timestamp(value)
+    return value.tz_localize(TZ) if value.tzinfo is None else value.tz_convert(TZ)
+
+
+@pytest.fixture(scope='session')
+def bars() -> pd.DataFrame:
+    return _bars()
+
+
+@pytest.fixture
+def provider(bars):
+    """Makes FakeProviders over `bars`; keyword arguments as for FakeProvider."""
+    return lambda **options: FakeProvider(bars, **options)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from attribution import attribute, holdings
+
+rng = np.random.default_rng(3)
+# Two years of random-walk prices for 40 names, a quarter of them listed part way through.
+prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (504, 40)), axis=0)),
+                      index=pd.bdate_range('2023-01-02', periods=504),
+                      columns=[f'T{i:04d}' for i in range(40)])
+for column, listed in zip(prices.columns[30:], rng.integers(1, 400, 10)):
+    prices.loc[prices.index[:listed], column] = np.nan
+weights = pd.Series(rng.pareto(1.5, 40) + 0.01, index=prices.columns)
+weights /= weights.sum()
+
+
+def test_contributions_add_up_to_the_index_return():
+    result = attribute(prices, weights)
+    np.testing.assert_allclose(result.contributions.sum(axis=1), result.returns, atol=1e-15)
+
+
+def test_index_return_is_the_change_in_capitalization():
+    result = attribute(prices, weights)
+    caps = (prices.ffill() * holdings(weights, prices)).fillna(0.0)
+    listed = prices.ffill().notna()
+    # Names are in the index from their first price, so each day compares the same names.
+    expected = (caps.where(listed.shift(fill_value=False), 0.0).sum(axis=1) / caps.shift().sum(axis=1)).iloc[1:] - 1
+    np.testing.assert_allclose(result.returns, expected, atol=1e-14)
+
+
+def test_linked_totals_add_up_to_the_compounded_return():
+    result = attribute(prices, weights)
+    start, end = prices.index[100], prices.index[400]
+    compounded = (1 + result.returns.loc[start:end]).prod() - 1
+    np.testing.assert_allclose(result.total(start, end).sum(), compounded, rtol=1e-12)
+    sectors = pd.Series(np.arange(40) % 3, index=prices.columns)
+    np.testing.assert_allclose(result.by_group(sectors).total(start, end).sum(), compounded, rtol=1e-12)
+
+
+def test_holdings_match_the_weights_on_the_as_of_date():
+    as_of = prices.index[300]
+    units = holdings(weights, prices, as_of)
+    caps = units * prices.ffill().loc[as_of]
+    listed = caps.notna() & (caps > 0)
+    np.testing.assert_allclose(caps[listed] / caps[listed].sum(), weights[listed] / weights[listed].sum())
+
+
+def test_listing_does_not_move_the_index():
+    late = prices.columns[prices.iloc[0].isna()][0]
+    first = prices[late].first_valid_index()
+    result = attribute(prices, weights)
+    assert result.contributions.loc[first, late] == 0.0
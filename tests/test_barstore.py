@@ -0,0 +1,79 @@
+import pandas as pd
+
+from barstore import BarStore
+
+TZ = 'America/New_York'
+
+
+def test_second_request_is_a_local_read(tmp_path, provider):
+    store, fetch = BarStore(tmp_path), provider()
+    first = store.history('T', start='2024-06-03', fetch=fetch)
+    second = store.history('T', start='2024-06-03', fetch=fetch)
+    assert len(fetch.calls) == 1
+    pd.testing.assert_frame_equal(first, second, check_freq=False)
+    assert first.index[0] == pd.Timestamp('2024-06-03', tz=TZ)
+
+
+def test_earlier_start_fetches_only_the_head(tmp_path, provider, bars):
+    store, fetch = BarStore(tmp_path), provider()
+    later = store.history('T', start='2024-06-03', fetch=fetch)
+    earlier = store.history('T', start='2024-03-01', fetch=fetch)
+    assert len(fetch.calls) == 2
+    assert pd.Timestamp(fetch.calls[1]['end']) == later.index[0]
+    assert earlier.index[0] == pd.Timestamp('2024-03-01', tz=TZ)
+    assert earlier.index.is_unique and earlier.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(earlier, bars[bars.index >= earlier.index[0]], check_freq=False)
+
+
+def test_stale_store_fetches_only_the_tail(tmp_path, provider, bars):
+    store, fetch = BarStore(tmp_path, max_age='0s'), provider(available='2024-09-01')
+    old = store.history('T', start='2024-06-03', fetch=fetch)
+    fetch.available = '2024-12-21'
+    new = store.history('T', start='2024-06-03', fetch=fetch)
+    assert len(fetch.calls) == 2
+    assert pd.Timestamp(fetch.calls[1]['start']) == old.index[-1]
+    assert new.index[-1] == bars.index[-1]
+    assert new.index.is_unique
+    pd.testing.assert_frame_equal(new, bars[bars.index >= new.index[0]], check_freq=False)
+
+
+def test_fresh_store_skips_the_tail(tmp_path, provider):
+    store, fetch = BarStore(tmp_path, max_age='1h'), provider(available='2024-09-01')
+    store.history('T', start='2024-06-03', fetch=fetch)
+    fetch.available = '2024-12-21'
+    store.history('T', start='2024-06-03', fetch=fetch)
+    assert len(fetch.calls) == 1
+
+
+def test_window_is_filtered_to_start_and_end(tmp_path, provider, bars):
+    store, fetch = BarStore(tmp_path), provider()
+    store.history('T', start='2024-01-02', fetch=fetch)
+    window = store.history('T', start='2024-03-01', end='2024-04-01', fetch=fetch)
+    assert len(fetch.calls) == 1
+    assert window.index[0] >= pd.Timestamp('2024-03-01', tz=TZ)
+    assert window.index[-1] < pd.Timestamp('2024-04-01', tz=TZ)
+    assert len(window) == len(bars.loc['2024-03-01':'2024-03-31'])
+
+
+def test_open_request_extends_a_bounded_one(tmp_path, provider, bars):
+    store, fetch = BarStore(tmp_path, max_age='1h'), provider()
+    bounded = store.history('T', start='2024-01-02', end='2024-03-01', fetch=fetch)
+    assert bounded.index[-1] < pd.Timestamp('2024-03-01', tz=TZ)
+    opened = store.history('T', start='2024-01-02', fetch=fetch)
+    assert len(fetch.calls) == 2
+    assert pd.Timestamp(fetch.calls[1]['start']) == bounded.index[-1]
+    assert opened.index[-1] == bars.index[-1]
+    pd.testing.assert_frame_equal(opened, bars[bars.index >= opened.index[0]], check_freq=False)
+    store.history('T', start='2024-01-02', fetch=fetch)
+    assert len(fetch.calls) == 2
+
+
+def test_later_bounded_request_fetches_up_to_its_end(tmp_path, provider, bars):
+    store, fetch = BarStore(tmp_path, max_age='1h'), provider()
+    store.history('T', start='2024-01-02', end='2024-03-01', fetch=fetch)
+    window = store.history('T', start='2024-01-02', end='2024-06-01', fetch=fetch)
+    assert len(fetch.calls) == 2
+    assert pd.Timestamp(fetch.calls[1]['end']) == pd.Timestamp('2024-06-01', tz=TZ)
+    assert len(window) == len(bars.loc['2024-01-02':'2024-05-31'])
+    store.history('T', start='2024-02-01', end='2024-05-01', fetch=fetch)
+    assert len(fetch.calls) == 2
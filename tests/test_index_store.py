@@ -0,0 +1,39 @@
+import shutil
+
+import pandas as pd
+
+from datafiles import INDEX_CSV
+from index_store import IndexStore
+
+
+def store(tmp_path) -> IndexStore:
+    csv_path = tmp_path / 'index.csv'
+    shutil.copyfile(INDEX_CSV, csv_path)
+    return IndexStore(csv_path, root=tmp_path / 'store')
+
+
+def test_appended_rows_are_ingested_alone(tmp_path):
+    index = store(tmp_path)
+    rows = index.refresh()
+    assert rows == len(pd.read_csv(index.csv_path))
+    assert index.refresh() == 0
+    with open(index.csv_path, 'a') as f:
+        f.write('2030-01-02,9000.5\n2030-01-03,90')
+    assert index.refresh() == 1
+    assert index.frame()['S&P500'].iloc[-1] == 9000.5
+    assert len(index.frame()) == rows + 1
+
+
+def test_edited_row_rebuilds_the_store(tmp_path):
+    index = store(tmp_path)
+    index.refresh()
+    text = index.csv_path.read_text()
+    first = text.splitlines()[1]
+    edited = first[:-1] + str((int(first[-1]) + 1) % 10)
+    index.csv_path.write_text(text.replace(first, edited, 1))
+    assert index.refresh() == len(pd.read_csv(index.csv_path))
+    fresh = IndexStore(index.csv_path, root=tmp_path / 'fresh')
+    fresh.refresh()
+    assert index.frame()['S&P500'].iloc[0] == float(edited.split(',')[1])
+    pd.testing.assert_frame_equal(index.frame(), fresh.frame())
+    assert index.trend().to_dict() == fresh.trend().to_dict()
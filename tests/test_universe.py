@@ -0,0 +1,46 @@
+import pandas as pd
+
+from universe import StockUniverse
+
+
+def universe(fetch, tickers, retries=2) -> StockUniverse:
+    return StockUniverse(tickers, period='max', fetch=fetch, store=None, max_workers=4, rate=None,
+                         retries=retries).load()
+
+
+def test_failure_is_recorded_without_aborting_the_batch(provider):
+    fetch = provider(failing=['BAD'])
+    loaded = universe(fetch, ['AAA', 'BAD', 'BB'])
+    assert list(loaded.frames) == ['AAA', 'BB']
+    assert isinstance(loaded.failures['BAD'], ConnectionError)
+    assert fetch.count('BAD') == 2
+
+
+def test_transient_failure_is_retried(provider):
+    fetch = provider(flaky=['FLAKY'])
+    loaded = universe(fetch, ['FLAKY'])
+    assert list(loaded.frames) == ['FLAKY']
+    assert not loaded.failures
+    assert fetch.count('FLAKY') == 2
+
+
+def test_empty_result_is_a_failure(provider):
+    loaded = universe(provider(empty=['NONE']), ['AAA', 'NONE'])
+    assert list(loaded.frames) == ['AAA']
+    assert isinstance(loaded.failures['NONE'], LookupError)
+
+
+def test_prices_are_aligned_in_ticker_order(provider):
+    loaded = universe(provider(), ['BB', 'AAA', 'BB'])
+    prices = loaded.prices()
+    assert list(prices.columns) == ['BB', 'AAA']
+    assert prices.dtypes.eq('float64').all()
+    pd.testing.assert_series_equal(prices['AAA'], loaded.frames['AAA']['Close'].astype('float64'),
+                                   check_names=False)
+    assert loaded.long().index.names == ['Ticker', 'Date']
+
+
+def test_nothing_loaded(provider):
+    loaded = universe(provider(failing=['BAD']), ['BAD'])
+    assert loaded.prices().empty
+    assert loaded.long().empty
@@ -0,0 +1,150 @@
+# Least-squares trend of the index level against time, kept as sufficient statistics.
+#
+# TrendStats holds n, Σx, Σy, Σxx, Σxy and Σyy. A fit needs nothing else, adding new
+# observations is O(1) per batch, and two disjoint samples combine by adding their
+# sums. x is measured in days from a fixed origin so the sums stay well conditioned.
+# Cross-validation uses expanding time-series folds: each fold's training fit and
+# out-of-sample R² come from differences of prefix sums, so nothing is refitted.
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class TrendStats:
+
+    FIELDS = ('n', 'sx', 'sy', 'sxx', 'sxy', 'syy')
+
+    def __init__(self, n: int=0, sx: float=0.0, sy: float=0.0, sxx: float=0.0, sxy: float=0.0, syy: float=0.0) -> None:
+        self.n = n
+        self.sx = sx
+        self.sy = sy
+        self.sxx = sxx
+        self.sxy = sxy
+        self.syy = syy
+
+    @classmethod
+    def from_arrays(cls, x, y) -> 'TrendStats':
+        stats = cls()
+        stats.update(x, y)
+        return stats
+
+    def update(self, x, y) -> None:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.n += len(x)
+        self.sx += x.sum()
+        self.sy += y.sum()
+        self.sxx += x @ x
+        self.sxy += x @ y
+        self.syy += y @ y
+
+    def __add__(self, other: 'TrendStats') -> 'TrendStats':
+        return TrendStats(*(getattr(self, f) + getattr(other, f) for f in self.FIELDS))
+
+    def __sub__(self, other: 'TrendStats') -> 'TrendStats':
+        return TrendStats(*(getattr(self, f) - getattr(other, f) for f in self.FIELDS))
+
+    @property
+    def slope(self) -> float:
+        denominator = self.n * self.sxx - self.sx ** 2
+        return (self.n * self.sxy - self.sx * self.sy) / denominator if denominator else np.nan
+
+    @property
+    def intercept(self) -> float:
+        return (self.sy - self.slope * self.sx) / self.n if self.n else np.nan
+
+    def predict(self, x):
+        return self.intercept + self.slope * np.asarray(x, dtype=np.float64)
+
+    def to_dict(self) -> dict:
+        return {f: float(getattr(self, f)) for f in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TrendStats':
+        stats = cls(**{f: data.get(f, 0.0) for f in cls.FIELDS})
+        stats.n = int(stats.n)
+        return stats
+
+    def sse(self, intercept: float, slope: float) -> float:
+        """Sum of squared residuals of the line (intercept, slope) over this sample."""
+        a, b = intercept, slope
+        return (self.syy - 2 * a * self.sy - 2 * b * self.sxy
+                + self.n * a * a + 2 * a * b * self.sx + b * b * self.sxx)
+
+    def r2(self, intercept: float=None, slope: float=None) -> float:
+        """R² of a line over this sample; by default of this sample's own fit."""
+        if intercept is None:
+            intercept, slope = self.intercept, self.slope
+        total = self.syy - self.sy ** 2 / self.n if self.n else 0.0
+        return 1 - self.sse(intercept, slope) / total if total > 0 else np.nan
+
+
+class PrefixStats:
+    """Cumulative sums over an ordered sample, so any contiguous range's TrendStats is O(1)."""
+
+    def __init__(self, x, y) -> None:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        terms = np.stack([np.ones_like(x), x, y, x * x, x * y, y * y])
+        self.sums = np.zeros((6, len(x) + 1))
+        np.cumsum(terms, axis=1, out=self.sums[:, 1:])
+
+    def __len__(self) -> int:
+        return self.sums.shape[1] - 1
+
+    def range(self, start: int, stop: int) -> TrendStats:
+        stats = TrendStats(*(self.sums[:, stop] - self.sums[:, start]))
+        stats.n = int(round(stats.n))
+        return stats
+
+
+def time_series_splits(n: int, n_splits: int=5) -> list:
+    """Expanding-window (train_stop, test_stop) pairs, as sklearn's TimeSeriesSplit draws them."""
+    test_size = n // (n_splits + 1)
+    starts = [n - test_size * (n_splits - i) for i in range(n_splits)]
+    return [(start, start + test_size) for start in starts]
+
+
+def cross_validate(prefix: PrefixStats, n_splits: int=5) -> np.ndarray:
+    """Out-of-sample R² of each fold; every fold is scored from prefix sums, not refitted."""
+    scores = []
+    for train_stop, test_stop in time_series_splits(len(prefix), n_splits):
+        train = prefix.range(0, train_stop)
+        test = prefix.range(train_stop, test_stop)
+        scores.append(test.r2(train.intercept, train.slope))
+    return np.array(scores)
+
+
+class TrendFit(NamedTuple):
+    """Index level regressed on time, measured in days since `origin`."""
+
+    stats: TrendStats
+    origin: pd.Timestamp
+    cv_scores: np.ndarray
+
+    @property
+    def slope_per_day(self) -> float:
+        return self.stats.slope
+
+    @property
+    def score(self) -> float:
+        return self.stats.r2()
+
+    def days(self, dates) -> np.ndarray:
+        return ((pd.DatetimeIndex(dates) - self.origin) / pd.Timedelta(days=1)).to_numpy()
+
+    def predict(self, dates) -> np.ndarray:
+        return self.stats.predict(self.days(dates))
+
+
+def fit_trend(dates, values, origin=None, stats: TrendStats=None, n_splits: int=5) -> TrendFit:
+    """Fit the trend of `values` over `dates`; pass `stats` when they are maintained already."""
+    dates = pd.DatetimeIndex(dates)
+    origin = pd.Timestamp(origin if origin is not None else dates[0])
+    x = ((dates - origin) / pd.Timedelta(days=1)).to_numpy()
+    prefix = PrefixStats(x, values)
+    if stats is None:
+        stats = prefix.range(0, len(prefix))
+    return TrendFit(stats, origin, cross_validate(prefix, n_splits))
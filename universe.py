@@ -0,0 +1,133 @@
+# Batched loading of many tickers through stocks.Stock.
+#
+# Tickers are loaded on a bounded thread pool. Every call to the data provider goes
+# through a shared rate limiter and is retried with exponential backoff. A ticker that
+# still fails is recorded in `failures` instead of aborting the batch. Results are
+# combined into one aligned (dates x tickers) frame, or a long (ticker, date) frame.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+from barstore import yahoo_history
+from stocks import Stock, default_store
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads."""
+
+    def __init__(self, rate: float, burst: int=1) -> None:
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def yahoo_symbol(symbol: str) -> str:
+    # Yahoo spells share classes with a dash: BRK.B -> BRK-B.
+    return symbol.replace('.', '-')
+
+
+class StockUniverse:
+
+    def __init__(
+        self,
+        tickers,
+        period: str='1y',
+        interval: str='1d',
+        start: str=None,
+        end: str=None,
+        fetch=yahoo_history,
+        store=default_store,
+        max_workers: int=8,
+        rate: float=4.0,
+        retries: int=3,
+    ) -> None:
+
+        self.tickers = list(dict.fromkeys(tickers))
+        self.period = period
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.fetch = fetch
+        self.store = store
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, burst=max_workers) if rate else None
+        self.retries = retries
+        self.frames = {}
+        self.failures = {}
+
+    @classmethod
+    def from_companies(cls, **kwargs) -> 'StockUniverse':
+        from snapshot import read_companies
+
+        symbols = read_companies(['Symbol']).Symbol
+        return cls([yahoo_symbol(symbol) for symbol in symbols], **kwargs)
+
+    def _fetch(self, *args, **kwargs) -> pd.DataFrame:
+        retrying = Retrying(
+            stop=stop_after_attempt(self.retries),
+            wait=wait_exponential(multiplier=0.5, max=8),
+            reraise=True,
+        )
+        for attempt in retrying:
+            with attempt:
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                return self.fetch(*args, **kwargs)
+
+    def _load_one(self, ticker: str) -> pd.DataFrame:
+        return Stock(
+            ticker,
+            period=self.period,
+            interval=self.interval,
+            start=self.start,
+            end=self.end,
+            fetch=self._fetch,
+            store=self.store,
+        ).df
+
+    def load(self) -> 'StockUniverse':
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {ticker: pool.submit(self._load_one, ticker) for ticker in self.tickers}
+            for ticker, future in futures.items():
+                try:
+                    df = future.result()
+                except Exception as e:
+                    self.failures[ticker] = e
+                    continue
+                if df.empty:
+                    self.failures[ticker] = LookupError(f'no bars returned for {ticker}')
+                else:
+                    self.frames[ticker] = df
+        return self
+
+    def prices(self, field: str='Close') -> pd.DataFrame:
+        """Wide (dates x tickers) float64 frame of one OHLCV field, in ticker order."""
+        columns = {ticker: df[field] for ticker, df in self.frames.items()}
+        if not columns:
+            return pd.DataFrame(dtype='float64')
+        # A single float64 block: .to_numpy() is one column-major array, each ticker contiguous.
+        return pd.concat(columns, axis=1).sort_index().astype('float64')
+
+    def long(self) -> pd.DataFrame:
+        """Long frame indexed by (Ticker, Date) with every OHLCV column."""
+        if not self.frames:
+            return pd.DataFrame()
+        return pd.concat(self.frames, names=['Ticker'])